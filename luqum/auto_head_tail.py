@@ -15,34 +15,32 @@ class AutoHeadTail(visitor.TreeTransformer):
 
     SPACER = " "
 
-    def add_head(self, node):
-        if not node.head:
-            node.head = self.SPACER
-
-    def add_tail(self, node):
-        if not node.tail:
-            node.tail = self.SPACER
-
     def visit_base_operation(self, node, context):
         new_node = node.clone_item()
         children = list(self.clone_children(node, new_node, context))
+        spacer = self.SPACER
         # add tail to first node
-        self.add_tail(children[0])
+        first = children[0]
+        first.tail = first.tail or spacer
         # add head and tail to inner nodes
-        for child in children[1:-1]:
-            self.add_head(child)
-            self.add_tail(child)
+        for i in range(1, len(children) - 1):
+            child = children[i]
+            child.head = child.head or spacer
+            child.tail = child.tail or spacer
         # add head to last
-        self.add_head(children[-1])
+        last = children[-1]
+        last.head = last.head or spacer
         new_node.children = children
         yield new_node
 
     def visit_unknown_operation(self, node, context):
         new_node = node.clone_item()
         children = list(self.clone_children(node, new_node, context))
+        spacer = self.SPACER
         # add tail to each node, but last
-        for child in children[:-1]:
-            self.add_tail(child)
+        for i in range(len(children) - 1):
+            child = children[i]
+            child.tail = child.tail or spacer
         new_node.children = children
         yield new_node
 
@@ -50,7 +48,8 @@ class AutoHeadTail(visitor.TreeTransformer):
         new_node = node.clone_item()
         children = list(self.clone_children(node, new_node, context))
         # add head to children, to have space between NOT and sub expression
-        self.add_head(children[0])
+        child = children[0]
+        child.head = child.head or self.SPACER
         new_node.children = children
         yield new_node
 
@@ -58,8 +57,9 @@ class AutoHeadTail(visitor.TreeTransformer):
         new_node = node.clone_item()
         children = list(self.clone_children(node, new_node, context))
         # add tail to lower_bound, and head to upper bound
-        self.add_tail(children[0])
-        self.add_head(children[-1])
+        low, high = children[0], children[-1]
+        low.tail = low.tail or self.SPACER
+        high.head = high.head or self.SPACER
         new_node.children = children
         yield new_node
 
@@ -1,32 +1,55 @@
 # -*- coding: utf-8 -*-
-import functools
 import math
 import re
+import warnings
 
 from . import tree
 from . import visitor
 from .exceptions import NestedSearchFieldException, ObjectSearchFieldException
 from .utils import flatten_nested_fields_specs, normalize_object_fields_specs
+# camel_to_lower is part of this module API, it is shared with visitors
+from .visitor import camel_to_lower
 
 
-def camel_to_lower(name):
-    return "".join(
-        "_" + w.lower() if w.isupper() else w.lower()
-        for w in name).lstrip("_")
+def sign(x):
+    """sign of x, as 1.0 or -1.0
 
+    Deprecated, it is no longer used by checks.
+    """
+    warnings.warn("luqum.check.sign is deprecated", DeprecationWarning, stacklevel=2)
+    return math.copysign(1, x)
+
+
+def _compile_word_issues(space_re, invalid_term_chars_re):
+    """combine space and invalid characters patterns, to find both in a single scan
+    """
+    return re.compile(
+        "(?P<space>%s)|(?P<invalid>%s)" % (space_re.pattern, invalid_term_chars_re.pattern),
+        space_re.flags | invalid_term_chars_re.flags)
+
+
+class _CheckerCache(dict):
+    """A dict of checkers by item class, resolving missing classes on access
+
+    :param callable resolve: function returning the checker for an item class
+    """
+
+    def __init__(self, resolve):
+        super().__init__()
+        self.resolve = resolve
 
-sign = functools.partial(math.copysign, 1)
+    def __missing__(self, item_cls):
+        checker = self[item_cls] = self.resolve(item_cls)
+        return checker
 
 
-def _check_children(f):
-    """A decorator to call check on item children
+def _no_error(f):
+    """A decorator to mark checkers that never find errors on the item itself
+
+    It is only honoured on LuceneCheck own methods, not on overrides.
     """
-    @functools.wraps(f)
-    def wrapper(self, item, parents):
-        yield from f(self, item, parents)
-        for child in item.children:
-            yield from self.check(child, parents + [item])
-    return wrapper
+    f.no_error = True
+    return f
 
 
 class LuceneCheck:
@@ -40,96 +63,201 @@ class LuceneCheck:
     field_name_re = re.compile(r"^\w+$")
     space_re = re.compile(r"\s")
     invalid_term_chars_re = re.compile(r"[+/-]")
+    # spaces and invalid characters in a single scan, for zealous checks
+    _word_issues_re = _compile_word_issues(space_re, invalid_term_chars_re)
 
     SIMPLE_EXPR_FIELDS = (
         tree.Boost, tree.Proximity, tree.Fuzzy, tree.Word, tree.Phrase)
 
     FIELD_EXPR_FIELDS = tuple(list(SIMPLE_EXPR_FIELDS) + [tree.FieldGroup])
+    # for a fast test on exact types, before resorting to isinstance
+    _FIELD_EXPR_TYPES = frozenset(FIELD_EXPR_FIELDS)
+
+    # error messages, they are formatted with their arguments
+    # only when errors are listed, not when just validating
+    ERROR_FIELD_NAME = "%s is not a valid field name"
+    ERROR_FIELD_EXPR = "field expression is not valid : %s"
+    ERROR_GROUP_MISUSE = "Group misuse, after SearchField you should use Group : %s"
+    ERROR_FIELD_GROUP_MISUSE = "FieldGroup misuse, it must be used after SearchField : %s"
+    ERROR_WORD_SPACE = "A single term value can't hold a space %s"
+    ERROR_WORD_CHARS = "Invalid characters in term value: %s"
+    ERROR_FUZZY_DEGREE = "invalid degree %d, it must be positive"
+    ERROR_FUZZY_TERM = "Fuzzy should be on a single term in %s"
+    ERROR_PROXIMITY_TERM = "Proximity can be only on a phrase in %s"
+    ERROR_NOT_IN_OR = (
+        "Prohibit or Not really means 'AND NOT' wich is inconsistent with OR operation in %s")
+    ERROR_UNKNOWN_ITEM = "Unknown item type %s : %s"
+
+    #: items (and their subclasses) whose children must also be checked
+    _HAS_CHILDREN = (
+        tree.SearchField, tree.Group, tree.FieldGroup, tree.Boost, tree.BaseOperation,
+        tree.Plus, tree.Not, tree.Prohibit)
+
+    # (checker method name, check children) by item class, see _checker_name
+    _checker_names = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # each checker class has its own methods, hence its own names
+        cls._checker_names = {}
+        # follow FIELD_EXPR_FIELDS overrides
+        cls._FIELD_EXPR_TYPES = frozenset(cls.FIELD_EXPR_FIELDS)
+        # follow space_re and invalid_term_chars_re overrides
+        cls._word_issues_re = _compile_word_issues(cls.space_re, cls.invalid_term_chars_re)
 
     def __init__(self, zeal=0):
         self.zeal = zeal
+        # cache of (checker method, check children) by item class
+        self._dispatch = _CheckerCache(self._get_checker)
 
     def _check_field_name(self, fname):
         return self.field_name_re.match(fname) is not None
 
-    @_check_children
-    def check_search_field(self, item, parents):
+    def check_search_field(self, item, parent):
         if not self._check_field_name(item.name):
-            yield "%s is not a valid field name" % item.name
-        if not isinstance(item.expr, self.FIELD_EXPR_FIELDS):
-            yield "field expression is not valid : %s" % item
-
-    @_check_children
-    def check_group(self, item, parents):
-        if parents and isinstance(parents[-1], tree.SearchField):
-            yield "Group misuse, after SearchField you should use Group : %s" % parents[-1]
-
-    @_check_children
-    def check_field_group(self, item, parents):
-        if not parents or not isinstance(parents[-1], tree.SearchField):
-            yield ("FieldGroup misuse, it must be used after SearchField : %s" %
-                   (parents[-1] if parents else item))
-
-    def check_range(self, item, parents):
+            yield self.ERROR_FIELD_NAME, item.name
+        expr = item.expr
+        if (type(expr) not in self._FIELD_EXPR_TYPES and
+                not isinstance(expr, self.FIELD_EXPR_FIELDS)):
+            yield self.ERROR_FIELD_EXPR, item
+
+    def check_group(self, item, parent):
+        if isinstance(parent, tree.SearchField):
+            yield self.ERROR_GROUP_MISUSE, parent
+
+    def check_field_group(self, item, parent):
+        if not isinstance(parent, tree.SearchField):
+            yield self.ERROR_FIELD_GROUP_MISUSE, (parent if parent is not None else item)
+
+    @_no_error
+    def check_range(self, item, parent):
         # TODO check lower bound <= higher bound taking into account wildcard and numbers
         return iter([])
 
-    def check_word(self, item, parents):
-        if self.space_re.search(item.value):
-            yield "A single term value can't hold a space %s" % item
-        if self.zeal and self.invalid_term_chars_re.search(item.value):
-            yield "Invalid characters in term value: %s" % item.value
-
-    def check_fuzzy(self, item, parents):
-        if sign(item.degree) < 0:
-            yield "invalid degree %d, it must be positive" % item.degree
+    def check_word(self, item, parent):
+        if not self.zeal:
+            if self.space_re.search(item.value):
+                yield self.ERROR_WORD_SPACE, item
+            return
+        issues = set()
+        for match in self._word_issues_re.finditer(item.value):
+            issues.add(match.lastgroup)
+            if len(issues) == 2:
+                break
+        if "space" in issues:
+            yield self.ERROR_WORD_SPACE, item
+        if "invalid" in issues:
+            yield self.ERROR_WORD_CHARS, item.value
+
+    def check_fuzzy(self, item, parent):
+        if item.degree < 0:
+            yield self.ERROR_FUZZY_DEGREE, item.degree
         if not isinstance(item.term, tree.Word):
-            yield "Fuzzy should be on a single term in %s" % str(item)
+            yield self.ERROR_FUZZY_TERM, item
 
-    def check_proximity(self, item, parents):
+    def check_proximity(self, item, parent):
         if not isinstance(item.term, tree.Phrase):
-            yield "Proximity can be only on a phrase in %s" % str(item)
+            yield self.ERROR_PROXIMITY_TERM, item
 
-    @_check_children
-    def check_boost(self, item, parents):
+    @_no_error
+    def check_boost(self, item, parent):
         return iter([])
 
-    @_check_children
-    def check_base_operation(self, item, parents):
+    @_no_error
+    def check_base_operation(self, item, parent):
         return iter([])
 
-    @_check_children
-    def check_plus(self, item, parents):
+    @_no_error
+    def check_plus(self, item, parent):
         return iter([])
 
-    def _check_not_operator(self, item, parents):
+    def _check_not_operator(self, item, parent):
         """Common checker for NOT and - operators"""
         if self.zeal:
-            if isinstance(parents[-1], tree.OrOperation):
-                yield ("Prohibit or Not really means 'AND NOT' " +
-                       "wich is inconsistent with OR operation in %s" % parents[-1])
-
-    @_check_children
-    def check_not(self, item, parents):
-        return self._check_not_operator(item, parents)
-
-    @_check_children
-    def check_prohibit(self, item, parents):
-        return self._check_not_operator(item, parents)
-
-    def check(self, item, parents=[]):
-        # dispatching check to anothe method
-        for cls in item.__class__.mro():
-            meth = getattr(self, "check_" + camel_to_lower(cls.__name__), None)
-            if meth is not None:
-                yield from meth(item, parents)
+            if isinstance(parent, tree.OrOperation):
+                yield self.ERROR_NOT_IN_OR, parent
+
+    def check_not(self, item, parent):
+        return self._check_not_operator(item, parent)
+
+    def check_prohibit(self, item, parent):
+        return self._check_not_operator(item, parent)
+
+    def _check_unknown(self, item, parent):
+        yield self.ERROR_UNKNOWN_ITEM, (item.__class__.__name__, item)
+
+    @classmethod
+    def _checker_name(cls, item_cls):
+        """find the check method name for a class of item, walking its mro
+
+        This is computed once for all instances of a checker class.
+
+        :return tuple: method name, and whether item children must be checked
+        """
+        try:
+            return cls._checker_names[item_cls]
+        except KeyError:
+            pass
+        for item_base in item_cls.__mro__:
+            name = "check_" + camel_to_lower(item_base.__name__)
+            if hasattr(cls, name):
+                result = name, issubclass(item_cls, cls._HAS_CHILDREN)
                 break
         else:
-            yield "Unknown item type %s : %s" % (item.__class__.__name__, str(item))
+            result = "_check_unknown", False
+        cls._checker_names[item_cls] = result
+        return result
+
+    def _get_checker(self, item_cls):
+        """get the check method for a class of item
+        """
+        name, check_children = self._checker_name(item_cls)
+        meth = getattr(self, name)
+        # a subclass may override a checker to find errors, even if marked
+        is_base = getattr(type(self), name, None) is LuceneCheck.__dict__.get(name)
+        if is_base and getattr(meth, "no_error", False):
+            meth = None  # no need to call it
+        return meth, check_children
+
+    def _format_error(self, error):
+        if isinstance(error, str):
+            return error
+        message, args = error
+        return message % args
+
+    def _walk(self, item, parent=None):
+        """walk item and its children, yielding errors
+
+        The tree is walked using an explicit stack (depth first, left to right),
+        dispatching each item to its check method,
+        which receives the item and its direct parent (or None).
+
+        Check methods yield errors as (message, arguments) tuples,
+        or directly as strings.
+
+        Errors are yielded as they are found, not yet formatted.
+        """
+        dispatch = self._dispatch
+        stack = [(item, parent)]
+        while stack:
+            item, parent = stack.pop()
+            meth, check_children = dispatch[type(item)]
+            if meth is not None:
+                yield from meth(item, parent)
+            if check_children:
+                stack.extend((child, item) for child in reversed(item.children))
+
+    def check(self, item, parents=()):
+        """iterate over errors of item and its children
+
+        :param list parents: parents of item, if it is not the root of the tree
+        """
+        return map(self._format_error, self._walk(item, parents[-1] if parents else None))
 
     def __call__(self, tree):
         """return True only if there are no error
         """
+        # check is lazy, so this stops at the first error, formatting only that one
         for error in self.check(tree):
             return False
         return True
@@ -159,20 +287,32 @@ class CheckNestedFields(visitor.TreeVisitor):
         self.nested_fields = flatten_nested_fields_specs(nested_fields)
         self.nested_prefixes = set(k.rsplit(".", 1)[0] for k in self.nested_fields)
         self.sub_fields = normalize_object_fields_specs(sub_fields)
+        # fields accepted under an object field, if we know them all
+        if self.sub_fields is not None and self.object_fields is not None:
+            self._known_fields = self.sub_fields | self.object_fields | self.nested_fields
+        else:
+            self._known_fields = None
         super().__init__(track_parents=True)
 
     def visit_search_field(self, node, context):
         """
         On search field node, check nested fields logic
         """
-        child_context = dict(context)  # copy
-        child_context["prefix"] = context["prefix"] + node.name.split(".")
-        yield from self.generic_visit(node, child_context)
+        # keep full name of field and its depth (number of parts)
+        fullname = context["fullname"]
+        fullname = fullname + "." + node.name if fullname else node.name
+        depth = context["depth"] + node.name.count(".") + 1
+        # child_context already is a copy, so we directly update it
+        # instead of making an intermediate copy for generic_visit
+        for child in node.children:
+            child_context = self.child_context(node, child, context)
+            child_context["fullname"] = fullname
+            child_context["depth"] = depth
+            yield from self.visit_iter(child, context=child_context)
 
     def _check_final_operation(self, node, context):
-        prefix = context["prefix"]
-        if prefix:
-            fullname = ".".join(prefix)
+        fullname = context["fullname"]
+        if fullname:
             if fullname in self.nested_prefixes:
                 raise NestedSearchFieldException(
                     ('''"{expr}" can't be directly attributed to "{field}"''' +
@@ -185,13 +325,10 @@ class CheckNestedFields(visitor.TreeVisitor):
                     .format(expr=str(node), field=fullname))
             # note : the above check do not stand for subfield,
             # as their field can have an expression
-            elif len(prefix) > 1:
+            elif context["depth"] > 1:
                 unknown_field = (
-                    self.sub_fields is not None and
-                    self.object_fields is not None and
-                    fullname not in self.sub_fields and
-                    fullname not in self.object_fields and
-                    fullname not in self.nested_fields)
+                    self._known_fields is not None and
+                    fullname not in self._known_fields)
                 if unknown_field:
                     raise ObjectSearchFieldException(
                         '''"{expr}" attributed to unknown nested or object field "{field}"'''
@@ -210,4 +347,4 @@ class CheckNestedFields(visitor.TreeVisitor):
         yield self._check_final_operation(node, context)
 
     def __call__(self, tree):
-        return list(self.visit_iter(tree, context={"prefix": []}))
+        return list(self.visit_iter(tree, context={"fullname": "", "depth": 0}))
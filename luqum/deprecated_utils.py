@@ -5,7 +5,7 @@ see :py:mod:`luqum.visitor` for newer implementations
 
 import warnings
 
-from .visitor import camel_to_lower
+from .visitor import _method_name
 
 
 class LuceneTreeVisitor:
@@ -24,44 +24,67 @@ class LuceneTreeVisitor:
 
     If the goal is to modify the initial tree,
     use :py:class:`LuceneTreeTranformer` instead.
+
+    .. note:: the list of parents given to visitor methods is updated during traversal,
+       it must not be modified, and must be copied if you need to keep it.
     """
     visitor_method_prefix = 'visit_'
     generic_visitor_method_name = 'generic_visit'
-
-    _get_method_cache = None
+    _deprecation_message = "LuceneTreeVisitor is deprecated in favor of visitor.TreeVisitor"
+
+    # bound visit methods by node class, set on first use
+    __slots__ = ("_methods",)
+
+    #: visit method names by node class, shared by all instances of a visitor class
+    _dispatch = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._dispatch = {}
+
+    def __init__(self):
+        # warn once, at creation, rather than on each (possibly recursive) visit call
+        warnings.warn(self._deprecation_message, DeprecationWarning, stacklevel=2)
+        self._methods = {}
+
+    @classmethod
+    def _get_method_name(cls, node_cls):
+        dispatch = cls._dispatch
+        method_name = dispatch.get(node_cls)
+        if method_name is None:
+            for klass in node_cls.mro():
+                method_name = _method_name(cls.visitor_method_prefix, klass)
+                if hasattr(cls, method_name):
+                    break
+            else:
+                method_name = cls.generic_visitor_method_name
+            dispatch[node_cls] = method_name
+        return method_name
 
     def _get_method(self, node):
-        if self._get_method_cache is None:
-            self._get_method_cache = {}
         try:
-            meth = self._get_method_cache[type(node)]
-        except KeyError:
-            for cls in node.__class__.mro():
-                try:
-                    method_name = "{}{}".format(
-                        self.visitor_method_prefix,
-                        camel_to_lower(cls.__name__)
-                    )
-                    meth = getattr(self, method_name)
-                    break
-                except AttributeError:
-                    continue
-            else:
-                meth = getattr(self, self.generic_visitor_method_name)
-            self._get_method_cache[type(node)] = meth
-        return meth
+            methods = self._methods
+        except AttributeError:
+            # __init__ was not called by a subclass, warn on first visit instead
+            warnings.warn(self._deprecation_message, DeprecationWarning, stacklevel=3)
+            methods = self._methods = {}
+        method = methods.get(type(node))
+        if method is None:
+            method = methods[type(node)] = getattr(self, self._get_method_name(type(node)))
+        return method
 
     def visit(self, node, parents=None):
-        """ Basic, recursive traversal of the tree. """
-        warnings.warn(
-            "LuceneTreeVisitor is deprecated in favor of visitor.TreeVisitor",
-            DeprecationWarning,
-        )
-        parents = parents or []
-        method = self._get_method(node)
-        yield from method(node, parents)
-        for child in node.children:
-            yield from self.visit(child, parents + [node])
+        """ Basic traversal of the tree (depth first, using a stack). """
+        # a single parents list is maintained, we keep the depth of nodes to truncate it
+        parents = [] if parents is None else list(parents)
+        stack = [(node, len(parents))]
+        while stack:
+            node, depth = stack.pop()
+            del parents[depth:]
+            method = self._get_method(node)
+            yield from method(node, parents)
+            parents.append(node)
+            stack.extend((child, depth + 1) for child in reversed(node.children))
 
     def generic_visit(self, node, parents=None):
         """
@@ -80,58 +103,65 @@ class LuceneTreeTransformer(LuceneTreeVisitor):
     the visitor method is ``None``, the node will be removed from its location,
     otherwise it is replaced with the return value. The return value may be the
     original node, in which case no replacement takes place.
+
+    .. note:: nodes are identified by identity, not equality,
+       so that replacing a node never affects an equal sibling.
     """
+    __slots__ = ()
+    _deprecation_message = (
+        "LuceneTreeTransformer is deprecated in favor of visitor.TreeTransformer")
 
     def replace_node(self, old_node, new_node, parent):
-        for k, v in parent.__dict__.items():  # pragma: no branch
-            if v == old_node:
-                parent.__dict__[k] = new_node
+        """replace old_node (found by identity) by new_node in parent,
+        removing it if new_node is None
+        """
+        # search attributes known to hold children, if any
+        for k in parent._children_attrs or list(parent.__dict__):  # pragma: no branch
+            v = getattr(parent, k)
+            if v is old_node:
+                setattr(parent, k, new_node)
                 break
-            elif isinstance(v, list):
-                try:
-                    i = v.index(old_node)
-                    if new_node is None:
-                        del v[i]
-                    else:
-                        v[i] = new_node
-                    break
-                except ValueError:
-                    pass  # this was not the attribute containing old_node
-            elif isinstance(v, tuple):
-                try:
-                    i = v.index(old_node)
+            elif isinstance(v, (list, tuple)):
+                for i, child in enumerate(v):
+                    if child is old_node:
+                        break
+                else:
+                    continue  # this was not the attribute containing old_node
+                is_tuple = isinstance(v, tuple)
+                if is_tuple:
                     v = list(v)
-                    if new_node is None:
-                        del v[i]
-                    else:
-                        v[i] = new_node
-                    parent.__dict__[k] = tuple(v)
-                    break
-                except ValueError:
-                    pass  # this was not the attribute containing old_node
+                if new_node is None:
+                    del v[i]
+                else:
+                    v[i] = new_node
+                if is_tuple:
+                    setattr(parent, k, tuple(v))
+                break
 
     def generic_visit(self, node, parent=None):
         return node
 
     def visit(self, node, parents=None):
         """
-        Recursively traverses the tree and replace nodes with the appropriate
-        visitor method's return values.
+        Traverses the tree (depth first, using a stack)
+        and replace nodes with the appropriate visitor method's return values.
         """
-        warnings.warn(
-            "LuceneTreeTransformer is deprecated in favor of visitor.TreeTransformer",
-            DeprecationWarning,
-        )
-        parents = parents or []
-        method = self._get_method(node)
-        new_node = method(node, parents)
-        if parents:
-            self.replace_node(node, new_node, parents[-1])
-        node = new_node
-        if node is not None:
-            for child in node.children:
-                self.visit(child, parents + [node])
-        return node
+        parents = [] if parents is None else list(parents)
+        root_depth = len(parents)
+        stack = [(node, root_depth)]
+        while stack:
+            node, depth = stack.pop()
+            del parents[depth:]
+            method = self._get_method(node)
+            new_node = method(node, parents)
+            if parents and new_node is not node:
+                self.replace_node(node, new_node, parents[-1])
+            if depth == root_depth:
+                new_tree = new_node
+            if new_node is not None:
+                parents.append(new_node)
+                stack.extend((child, depth + 1) for child in reversed(new_node.children))
+        return new_tree
 
 
 class LuceneTreeVisitorV2(LuceneTreeVisitor):
@@ -154,6 +184,8 @@ class LuceneTreeVisitorV2(LuceneTreeVisitor):
     If the goal is to modify the initial tree,
     use :py:class:`LuceneTreeTranformer` instead.
     """
+    __slots__ = ()
+    _deprecation_message = "LuceneTreeVisitorV2 is deprecated in favor of visitor.TreeVisitor"
 
     def visit(self, node, parents=None, context=None):
         """ Basic, recursive traversal of the tree.
@@ -162,10 +194,6 @@ class LuceneTreeVisitorV2(LuceneTreeVisitor):
         :parma dict context: a dict of contextual variable for free use
           to track states while traversing the tree
         """
-        warnings.warn(
-            "LuceneTreeVisitorV2 is deprecated in favor of visitor.TreeVisitor",
-            DeprecationWarning,
-        )
         if parents is None:
             parents = []
 
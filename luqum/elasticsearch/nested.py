@@ -6,21 +6,38 @@ This is a problem if you extensively use it.
 
 
 def get_first_name(query):
-    if isinstance(query, dict):
-        if "_name" in query:
-            return query["_name"]
-        elif "bool" in query:
-            # do not go down bool
-            return None
-        else:
-            children = query.values()
-    elif isinstance(query, list):
-        children = query
-    else:
-        return None
-    iter_candidates = (get_first_name(child) for child in children)
-    candidates = [candidate for candidate in iter_candidates if candidate is not None]
-    return candidates[0] if candidates else None
+    # depth first search, stopping at first name found
+    stack = [query]
+    while stack:
+        query = stack.pop()
+        if isinstance(query, dict):
+            if "_name" in query:
+                return query["_name"]
+            elif "bool" in query:
+                # do not go down bool
+                continue
+            stack.extend(reversed(list(query.values())))
+        elif isinstance(query, list):
+            stack.extend(reversed(query))
+    return None
+
+
+_BOOL_OPS = ("must", "should", "must_not")
+# keys of a nested query which are not kept when nesting sub queries
+_NESTED_EXCLUDED_KEYS = frozenset(("query", "name"))
+
+
+def _nest_query(query, name, nestings, query_nester=None):
+    """nest query in nested queries with given parameters (outermost first),
+    then with query_nester if any, naming the outer nested query with name
+    """
+    for params in reversed(nestings):
+        query = {"nested": {"query": query, **params}}
+    if query_nester is not None:
+        query = query_nester(query, name)
+    if name is not None and nestings:
+        query["nested"]["_name"] = name
+    return query
 
 
 def extract_nested_queries(query, query_nester=None):
@@ -49,47 +66,40 @@ def extract_nested_queries(query, query_nester=None):
        While the second would only match if `x` contains `"y z"` or `"z y"`
     """
     queries = []  # this contains our result
-    in_nested = query_nester is not None
-    sub_query_nester = query_nester
-    if isinstance(query, dict):
-        if "nested" in query:
-            params = {k: v for k, v in query["nested"].items() if k not in ("query", "name")}
-
-            def sub_query_nester(req, name):
-                nested = {"nested": {"query": req, **params}}
-                if query_nester is not None:
-                    nested = query_nester(nested, name)
-                if name is not None:
-                    nested["nested"]["_name"] = name
-                return nested
-
-        bool_param = {"must", "should", "must_not"} & set(query.keys())
-        if bool_param and in_nested:
-            # we are in a list of operations in a bool inside a nested,
-            # make a query with nested on sub arguments
-            op, = bool_param  # must or should or must_not
-            # normalize to a list
-            sub_queries = query[op] if isinstance(query[op], list) else [query[op]]
-            # add nesting
-            nested_sub_queries = [
-                query_nester(sub_query, get_first_name(sub_query)) for sub_query in sub_queries
-            ]
-            # those are queries we want to return
-            queries.extend(nested_sub_queries)
-            # continue processing in each sub query
-            # (before nesting, nesting is contained in query_nester)
-            children = sub_queries
+    # we walk the query depth first, using a stack of (query, nestings)
+    # where nestings is a tuple of parameters of nested queries above query
+    stack = [(query, ())]
+    while stack:
+        query, nestings = stack.pop()
+        in_nested = bool(nestings) or query_nester is not None
+        sub_nestings = nestings
+        if isinstance(query, dict):
+            if "nested" in query:
+                params = {
+                    k: v for k, v in query["nested"].items() if k not in _NESTED_EXCLUDED_KEYS}
+                sub_nestings = nestings + (params,)
+            bool_ops = [op for op in _BOOL_OPS if op in query] if in_nested else []
+            if bool_ops:
+                # we are in a list of operations in a bool inside a nested,
+                # make a query with nested on sub arguments
+                children = []
+                for op in bool_ops:  # must or should or must_not
+                    # normalize to a list
+                    sub_queries = query[op] if isinstance(query[op], list) else [query[op]]
+                    # add nesting, those are queries we want to return
+                    queries.extend(
+                        _nest_query(sub_query, get_first_name(sub_query), nestings, query_nester)
+                        for sub_query in sub_queries
+                    )
+                    # continue processing in each sub query
+                    # (before nesting, nesting is contained in sub_nestings)
+                    children.extend(sub_queries)
+            else:
+                children = query.values()
+        elif isinstance(query, list):
+            children = query
         else:
-            children = query.values()
-    elif isinstance(query, list):
-        children = query
-    else:
-        # leaf: final recursivity
-        children = []
-
-    # recurse
-    for child_query in children:
-        queries.extend(
-            extract_nested_queries(child_query, query_nester=sub_query_nester)
-        )
+            # leaf
+            children = []
+        stack.extend((child_query, sub_nestings) for child_query in reversed(list(children)))
     return queries
@@ -1,5 +1,12 @@
 """Analyzing elasticSearch schema to provide helpers for query transformation
 """
+import copy
+
+
+# types of fields which are analyzed or which contain other fields
+_ANALYZED_TYPES = frozenset(("text", "string", "nested", "object"))
+# types of fields which contain other fields
+_OBJECT_TYPES = frozenset(("object", "nested"))
 
 
 class SchemaAnalyzer:
@@ -7,20 +14,40 @@ class SchemaAnalyzer:
     to use when transforming queries.
 
     :param dict schema: the index settings as a dict.
+
+    .. note:: fields are analyzed once, on first need,
+       so the schema is not expected to change afterwards,
+       unless it is replaced by setting :py:attr:`mappings`.
     """
 
     def __init__(self, schema):
         self.settings = schema.get("settings", {})
+        # fields analysis, computed on first need by _compute_all
+        self._fields_cache = None
         mappings = schema.get("mappings", {})
+        # we keep the mapping of each document type, as they are walked the same way
         if mappings.get("properties"):
             # ES >= 6 : one document type per index
-            self.mappings = {"_doc": mappings}
+            self._roots = [mappings]
+            self._mappings = None
         else:
             # ES < 6 : multiple document types per index allowed
             self.mappings = mappings
 
-    def _dot_name(self, fname, parents):
-        return ".".join([p[0] for p in parents] + [fname])
+    @property
+    def mappings(self):
+        """mappings by document type, "_doc" being the only one for ES >= 6
+        """
+        if self._mappings is None:
+            return {"_doc": self._roots[0]}
+        return self._mappings
+
+    @mappings.setter
+    def mappings(self, mappings):
+        self._roots = list(mappings.values())
+        self._mappings = mappings
+        # fields must be analyzed again
+        self._fields_cache = None
 
     def default_field(self):
         try:
@@ -28,79 +55,127 @@ class SchemaAnalyzer:
         except KeyError:
             return "*"
 
+    def _iter_subfields(self, fname, fdef, parents, dot_name):
+        subfield_parents = parents + [(fname, fdef)]
+        subdef = dict(fdef)  # sub field definition overload their parents one
+        subfield_defs = subdef.pop("fields")
+        for subname, subfield_def in subfield_defs.items():
+            yield subname, dict(subdef, **subfield_def), subfield_parents, dot_name + "." + subname
+
     def _walk_properties(self, properties, parents=None, subfields=False):
+        """walk properties, depth first
+
+        :return: an iterator of (field name, field definition, parents, full dotted name)
+        """
         if parents is None:
             parents = []
-        for fname, fdef in properties.items():
-            yield fname, fdef, parents
-            if subfields and "fields" in fdef:
-                subfield_parents = parents + [(fname, fdef)]
-                subdef = dict(fdef)  # sub field definition overload their parents one
-                subfield_defs = subdef.pop("fields")
-                for fname, fdef in subfield_defs.items():
-                    fdef = dict(subdef, **fdef)
-                    yield fname, fdef, subfield_parents
-            inner_properties = fdef.get("properties", {})
-            if inner_properties:
-                new_parents = parents + [(fname, fdef)]
-                yield from self._walk_properties(inner_properties, new_parents, subfields)
+        prefix = "".join(p[0] + "." for p in parents)
+        # we use a stack of (properties iterator, parents, prefix of dotted names)
+        stack = [(iter(properties.items()), parents, prefix)]
+        while stack:
+            properties, parents, prefix = stack[-1]
+            for fname, fdef in properties:
+                dot_name = prefix + fname
+                yield fname, fdef, parents, dot_name
+                if subfields and "fields" in fdef:
+                    yield from self._iter_subfields(fname, fdef, parents, dot_name)
+                inner_properties = fdef.get("properties")
+                if inner_properties:
+                    # walk inner properties before going on with siblings
+                    stack.append((
+                        iter(inner_properties.items()),
+                        parents + [(fname, fdef)],
+                        dot_name + ".",
+                    ))
+                    break
+            else:
+                stack.pop()
 
-    def iter_fields(self, subfields=False):
-        for mapping in self.mappings.values():
+    def _iter_fields(self, subfields=False):
+        for mapping in self._roots:
             yield from self._walk_properties(mapping.get("properties", {}), subfields=subfields)
 
+    def iter_fields(self, subfields=False):
+        for fname, fdef, parents, _ in self._iter_fields(subfields):
+            yield fname, fdef, parents
+
+    def _is_not_analyzed(self, fdef):
+        ftype = fdef.get("type")
+        return (
+            ftype not in _ANALYZED_TYPES or
+            (ftype == "string" and fdef.get("index", "") == "not_analyzed")
+        )
+
+    def _compute_all(self):
+        """Walk fields once to compute not analyzed, nested, object and sub fields
+
+        The result is cached, as the schema does not change.
+
+        :return dict: with keys "not_analyzed_fields", "nested_fields",
+            "object_fields" and "sub_fields"
+        """
+        if self._fields_cache is not None:
+            return self._fields_cache
+        not_analyzed_fields = []
+        nested_fields = {}
+        # dicts of nested_fields, indexed by the path (tuple of field names) they stand for
+        nested_by_path = {(): nested_fields}
+        object_fields = []
+        sub_fields = []
+        for fname, fdef, parents, dot_name in self._iter_fields():
+            if self._is_not_analyzed(fdef):
+                not_analyzed_fields.append(dot_name)
+            if fdef.get("fields"):
+                subfields = self._iter_subfields(fname, fdef, parents, dot_name)
+                for _, subdef, _, sub_dot_name in subfields:
+                    if self._is_not_analyzed(subdef):
+                        not_analyzed_fields.append(sub_dot_name)
+                    sub_fields.append(sub_dot_name)
+            ptype = parents[-1][1].get("type") if parents else None
+            if ptype == "nested":
+                path = tuple(n for n, _ in parents)
+                target = nested_by_path.get(path)
+                if target is None:
+                    # add it to nearest known ancestor, using a dotted name
+                    i = len(path) - 1
+                    while path[:i] not in nested_by_path:
+                        i -= 1
+                    target = nested_by_path[path[:i]].setdefault(".".join(path[i:]), {})
+                    nested_by_path[path] = target
+                target[fname] = nested_by_path[path + (fname,)] = {}
+            elif ptype == "object" and fdef.get("type") not in _OBJECT_TYPES:
+                object_fields.append(dot_name)
+        self._fields_cache = {
+            "not_analyzed_fields": tuple(not_analyzed_fields),
+            "nested_fields": nested_fields,
+            "object_fields": tuple(object_fields),
+            "sub_fields": tuple(sub_fields),
+        }
+        return self._fields_cache
+
     def not_analyzed_fields(self):
-        for fname, fdef, parents in self.iter_fields(subfields=True):
-            not_analyzed = (
-                (fdef.get("type") == "string" and fdef.get("index", "") == "not_analyzed") or
-                fdef.get("type") not in ("text", "string", "nested", "object")
-            )
-            if not_analyzed:
-                yield self._dot_name(fname, parents)
+        yield from self._compute_all()["not_analyzed_fields"]
 
     def nested_fields(self):
-        result = {}
-        for fname, fdef, parents in self.iter_fields():
-            pdef = parents[-1][1] if parents else {}
-            if pdef.get("type") == "nested":
-                target = result
-                cumulated = []
-                for n, _ in parents:
-                    cumulated.append(n)
-                    key = ".".join(cumulated)
-                    if key in target:
-                        target = target[key]
-                        cumulated = []
-                if cumulated:
-                    key = ".".join(cumulated)
-                    target = target.setdefault(key, {})
-                target[fname] = {}
-        return result
+        # a copy, as the result is cached
+        return copy.deepcopy(self._compute_all()["nested_fields"])
 
     def object_fields(self):
-        for fname, fdef, parents in self.iter_fields():
-            pdef = parents[-1][1] if parents else {}
-            if pdef.get("type") == "object" and fdef.get("type") not in ("object", "nested"):
-                yield self._dot_name(fname, parents)
+        yield from self._compute_all()["object_fields"]
 
     def sub_fields(self):
         """return all known subfields
         """
-        # we do not ask subfields, for they would be lost in the mass
-        for fname, fdef, parents in self.iter_fields():
-            subfields = fdef.get("fields")
-            if subfields:
-                subfield_parents = parents + [(fname, fdef)]
-                for subname in subfields:
-                    yield self._dot_name(subname, subfield_parents)
+        yield from self._compute_all()["sub_fields"]
 
     def query_builder_options(self):
         """return options suitable for
         :py:class:`luqum.elasticsearch.visitor.ElasticsearchQueryBuilder`
         """
+        fields = self._compute_all()  # a single walk for all options
         return {
             "default_field": self.default_field(),
-            "not_analyzed_fields": list(self.not_analyzed_fields()),
-            "nested_fields": self.nested_fields(),
-            "object_fields": list(self.object_fields()),
+            "not_analyzed_fields": list(fields["not_analyzed_fields"]),
+            "nested_fields": copy.deepcopy(fields["nested_fields"]),
+            "object_fields": list(fields["object_fields"]),
         }
@@ -1,14 +1,21 @@
 import abc
 import re
+import sys
 
 from ..tree import Term
 
 
+# methods whose query does not take the field as key
+_FIELDLESS_METHODS = frozenset(('query_string', 'multi_match'))
+
+
 class JsonSerializableMixin:
     """
     Mixin to force subclasses to implement the json method
     """
 
+    __slots__ = ()
+
     @property
     @abc.abstractmethod
     def json(self):
@@ -21,58 +28,79 @@ class AbstractEItem(JsonSerializableMixin):
     For instance : {"term": {"field": {"value": "query"}}}
     """
 
-    boost = None
-    _fuzzy = None
+    __slots__ = (
+        '_method', '_fields', '_field', '_no_analyze', 'zero_terms_query', 'field_options', '_name',
+        'boost', '_fuzzy', '_q', '_method_cache')
 
     _KEYS_TO_ADD = ('boost', 'fuzziness', '_name')
     ADDITIONAL_KEYS_TO_ADD = ()
+    # keys added to json, computed for each class
+    _ALL_KEYS = _KEYS_TO_ADD + ADDITIONAL_KEYS_TO_ADD
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._ALL_KEYS = cls._KEYS_TO_ADD + cls.ADDITIONAL_KEYS_TO_ADD
 
     def __init__(self, no_analyze=None, method='term', fields=[], _name=None, field_options=None):
         self._method = method
+        # resolved method, see method
+        self._method_cache = None
         self._fields = fields
+        # joined once, and interned as the same fields come back in many items
+        self._field = sys.intern('.'.join(fields))
         self._no_analyze = no_analyze if no_analyze else []
         self.zero_terms_query = 'none'
         self.field_options = field_options or {}
-        if _name is not None:
-            self._name = _name
+        self.boost = None
+        self._fuzzy = None
+        self._q = None
+        self._name = _name
 
     @property
     def json(self):
         field = self.field
-        inner_json = dict(self.field_options.get(field, {}))
+        method = self.method
+        inner_json = dict(self.field_options.get(field, ()))
         result = inner_json.pop('match_type', None)  # remove "match_type" key
         if not result:  # conditionally remove "type" (for backward compatibility)
             inner_json.pop('type', None)
-        if self.method in ['query_string', 'multi_match']:
-            json = {self.method: inner_json}
+        if method in _FIELDLESS_METHODS:
+            json = {method: inner_json}
         else:
-            json = {self.method: {field: inner_json}}
+            json = {method: {field: inner_json}}
 
         # add base conf
-        keys = self._KEYS_TO_ADD + self.ADDITIONAL_KEYS_TO_ADD
-        for key in keys:
+        for key in self._ALL_KEYS:
             value = getattr(self, key, None)
-            if value is not None:
-                if key == 'q':
-                    if 'match' in self.method:
-                        inner_json['query'] = value
-                        if self.method == 'match':
-                            inner_json['zero_terms_query'] = self.zero_terms_query
-                    elif self.method == 'query_string':
-                        inner_json['query'] = value
-                        inner_json['default_field'] = self.field
-                        inner_json['analyze_wildcard'] = inner_json.get('analyze_wildcard', True)
-                        inner_json['allow_leading_wildcard'] = inner_json.get(
-                            'allow_leading_wildcard', True)
-                    else:
-                        inner_json['value'] = value
-                else:
-                    inner_json[key] = value
+            if value is None:
+                continue
+            if key != 'q':
+                inner_json[key] = value
+            elif 'match' in method:
+                inner_json['query'] = value
+                if method == 'match':
+                    inner_json['zero_terms_query'] = self.zero_terms_query
+            elif method == 'query_string':
+                inner_json['query'] = value
+                inner_json['default_field'] = field
+                inner_json.setdefault('analyze_wildcard', True)
+                inner_json.setdefault('allow_leading_wildcard', True)
+            else:
+                inner_json['value'] = value
         return json
 
     @property
     def field(self):
-        return '.'.join(self._fields)
+        return self._field
+
+    @property
+    def q(self):
+        return self._q
+
+    @q.setter
+    def q(self, q):
+        self._q = q
+        self._method_cache = None
 
     @property
     def fuzziness(self):
@@ -81,18 +109,31 @@ class AbstractEItem(JsonSerializableMixin):
     @fuzziness.setter
     def fuzziness(self, fuzzy):
         self._method = 'fuzzy'
+        self._method_cache = None
         self._fuzzy = fuzzy
 
     def _value_has_wildcard_char(self):
-        # reuse the work done in Term
-        term = Term(getattr(self, 'q', ''))
-        return term.has_wildcard()
+        # reuse the work done in Term, without building one
+        q = self.q
+        if q is None or ('*' not in q and '?' not in q):
+            return False  # no need for the pattern, which looks for escapes
+        return Term.WILDCARDS_PATTERN.search(q) is not None
 
     def _is_analyzed(self):
         return self.field not in self._no_analyze
 
     @property
     def method(self):
+        """the elasticsearch query type of the item
+
+        It is computed once, and again only if q or fuzziness change.
+        """
+        method = self._method_cache
+        if method is None:
+            method = self._method_cache = self._resolve_method()
+        return method
+
+    def _resolve_method(self):
         is_analyzed = self._is_analyzed()
         if not is_analyzed and self._value_has_wildcard_char():
             return 'wildcard'
@@ -120,6 +161,8 @@ class EWord(AbstractEItem):
         ... )
     """
 
+    __slots__ = ()
+
     ADDITIONAL_KEYS_TO_ADD = ('q', )
 
     def __init__(self, q, *args, **kwargs):
@@ -131,7 +174,7 @@ class EWord(AbstractEItem):
         # field:* is transformed to exists query
         if self.q == '*':
             query = {"exists": {"field": self.field}}
-            name = getattr(self, "_name", None)
+            name = self._name
             if name is not None:
                 query["exists"]["_name"] = name
             return query
@@ -150,11 +193,14 @@ class EPhrase(AbstractEItem):
         ... )
     """
 
-    ADDITIONAL_KEYS_TO_ADD = ('q',)
-    _proximity = None
+    __slots__ = ('_proximity',)
+
+    ADDITIONAL_KEYS_TO_ADD = ('q', 'slop')
+    SPACES_PATTERN = re.compile(r'\s+')
 
     def __init__(self, phrase, *args, **kwargs):
         super().__init__(method='match_phrase', *args, **kwargs)
+        self._proximity = None
         phrase = self._replace_CR_and_LF_by_a_whitespace(phrase)
         self.q = self._remove_double_quotes(phrase)
 
@@ -162,7 +208,10 @@ class EPhrase(AbstractEItem):
         return "%s(%s=%s)" % (self.__class__.__name__, self.field, self.q)
 
     def _replace_CR_and_LF_by_a_whitespace(self, phrase):
-        return re.sub(r'\s+', ' ', phrase)
+        if phrase[:1].isspace() or phrase[-1:].isspace():
+            return self.SPACES_PATTERN.sub(' ', phrase)
+        # same result, as split only drops spaces at both ends, but faster
+        return ' '.join(phrase.split())
 
     def _remove_double_quotes(self, phrase):
         return phrase[1:-1]
@@ -178,7 +227,6 @@ class EPhrase(AbstractEItem):
     @slop.setter
     def slop(self, slop):
         self._proximity = slop
-        self.ADDITIONAL_KEYS_TO_ADD += ('slop', )
 
 
 class ERange(AbstractEItem):
@@ -193,24 +241,27 @@ class ERange(AbstractEItem):
         ... )
     """
 
+    # bounds not given are None, and skipped by json
+    __slots__ = ('lt', 'lte', 'gt', 'gte')
+
+    ADDITIONAL_KEYS_TO_ADD = ('lt', 'lte', 'gt', 'gte')
+
     def __init__(self, lt=None, lte=None, gt=None, gte=None, *args, **kwargs):
         super().__init__(method='range', *args, **kwargs)
+        self.lt = self.lte = self.gt = self.gte = None
         if lt and lt != '*':
             self.lt = lt
-            self.ADDITIONAL_KEYS_TO_ADD += ('lt', )
         elif lte and lte != '*':
             self.lte = lte
-            self.ADDITIONAL_KEYS_TO_ADD += ('lte', )
         if gt and gt != '*':
             self.gt = gt
-            self.ADDITIONAL_KEYS_TO_ADD += ('gt', )
         elif gte and gte != '*':
             self.gte = gte
-            self.ADDITIONAL_KEYS_TO_ADD += ('gte', )
 
 
 class AbstractEOperation(JsonSerializableMixin):
-    pass
+
+    __slots__ = ()
 
 
 class EOperation(AbstractEOperation):
@@ -218,10 +269,14 @@ class EOperation(AbstractEOperation):
     Abstract operation taking care of the json build
     """
 
+    # boost may be set by the query builder, like on items, but is not used
+    __slots__ = ('items', '_method', 'options', 'boost')
+
     def __init__(self, items, **options):
         self.items = items
         self._method = None
         self.options = options
+        self.boost = None
 
     def __repr__(self):
         items = ", ".join(i.__repr__() for i in self.items)
@@ -241,15 +296,21 @@ class ENested(AbstractEOperation):
     Take care to remove ENested children
     """
 
+    # boost may be set by the query builder, like on items, but is not used
+    __slots__ = ('_nested_path', '_path', 'items', '_name', 'boost')
+
     def __init__(self, nested_path, nested_fields, items, *args, _name=None, **kwargs):
 
         self._nested_path = [nested_path]
+        # joined once, it is compared to every nested child
+        self._path = '.'.join(self._nested_path)
         self.items = self._exclude_nested_children(items)
         self._name = _name
+        self.boost = None
 
     @property
     def nested_path(self):
-        return '.'.join(self._nested_path)
+        return self._path
 
     def __repr__(self):
         return "%s(%s, %s)" % (self.__class__.__name__, self.nested_path, self.items)
@@ -278,23 +339,25 @@ class ENested(AbstractEOperation):
             ...     'ENested(a, EMust(EPhrase(text=François), EPhrase(text=Dupont)))'
             ... )
         """
-        if isinstance(subtree, ENested):
-            # Exclude ENested
-
-            if subtree.nested_path == self.nested_path:
-                return self._exclude_nested_children(subtree.items)
-            else:
-                return subtree
-        elif isinstance(subtree, AbstractEOperation):
-            # Exclude ENested in children
-            subtree.items = [
-                self._exclude_nested_children(child)
-                for child in subtree.items
-            ]
-            return subtree
-        else:
-            # return the subtree once ENested has been excluded
-            return subtree
+        # the tree is walked with an explicit stack, to support deep trees
+        subtree = self._unwrap_same_nested(subtree)
+        stack = [subtree]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, AbstractEOperation) and not isinstance(item, ENested):
+                # Exclude ENested in children
+                item.items = [self._unwrap_same_nested(child) for child in item.items]
+                stack.extend(item.items)
+        # return the subtree once ENested has been excluded
+        return subtree
+
+    def _unwrap_same_nested(self, item):
+        """remove ENested on same path as this one, wrapping item
+        """
+        path = self.nested_path
+        while isinstance(item, ENested) and item.nested_path == path:
+            item = item.items
+        return item
 
     @property
     def json(self):
@@ -323,15 +386,22 @@ class EShould(EOperation):
         ...     ]}}
         ... )
     """
+
+    __slots__ = ()
+
     operation = 'should'
 
 
 class AbstractEMustOperation(EOperation):
 
+    __slots__ = ()
+
     def __init__(self, items, **options):
         op = super().__init__(items, **options)
         for item in self.items:
-            item.zero_terms_query = self.zero_terms_query
+            # zero_terms_query is only meaningful for items
+            if not isinstance(item, AbstractEOperation):
+                item.zero_terms_query = self.zero_terms_query
         return op
 
 
@@ -355,6 +425,9 @@ class EMust(AbstractEMustOperation):
         ...     ]}}
         ... )
     """
+
+    __slots__ = ()
+
     zero_terms_query = 'all'
     operation = 'must'
 
@@ -373,12 +446,17 @@ class EMustNot(AbstractEMustOperation):
         ...     ]}}
         ... )
     """
+
+    __slots__ = ()
+
     zero_terms_query = 'none'
     operation = 'must_not'
 
 
 class EBoolOperation(EOperation):
 
+    __slots__ = ()
+
     @property
     def json(self):
         must_items = []
@@ -421,12 +499,17 @@ class ElasticSearchItemFactory:
     def __init__(self, no_analyze, nested_fields, field_options):
         self._no_analyze = no_analyze
         self._nested_fields = nested_fields
-        self._nested_fields = nested_fields
         self._field_options = field_options
+        # whether a class is an item class, by class
+        self._is_item = {}
 
     def build(self, cls, *args, **kwargs):
+        try:
+            is_item = self._is_item[cls]
+        except KeyError:
+            is_item = self._is_item[cls] = issubclass(cls, AbstractEItem)
         # add parameters based on item type
-        if issubclass(cls, AbstractEItem):
+        if is_item:
             # eventually add field defaults to kwargs
             if "field_options" not in kwargs:
                 kwargs = dict(kwargs, field_options=self._field_options)
@@ -101,10 +101,8 @@ class ElasticsearchQueryBuilder(TreeVisitor):
 
         """
         super().__init__(track_parents=True)
-        if not_analyzed_fields:
-            self._not_analyzed_fields = not_analyzed_fields
-        else:
-            self._not_analyzed_fields = []
+        # a set, as we test fields against it
+        self._not_analyzed_fields = frozenset(not_analyzed_fields or ())
 
         self.nested_fields = self._normalize_nested_fields(nested_fields)
         self._nested_prefixes = set(
@@ -184,9 +182,13 @@ class ElasticsearchQueryBuilder(TreeVisitor):
         :param current_node:
         :return:
         """
-        for child in children:
-            if type(child) is type(current_node):
-                yield from self.simplify_if_same(child.children, current_node)
+        node_type = type(current_node)
+        # walk with an explicit stack, as long chains of operations can be deep
+        stack = list(reversed(children))
+        while stack:
+            child = stack.pop()
+            if type(child) is node_type:
+                stack.extend(reversed(child.children))
             else:
                 yield child
 
@@ -1,12 +1,22 @@
 # -*- coding: utf-8 -*-
 """Base classes to implement a visitor pattern.
 """
+import functools
+import re
 
+_CAMEL_RE = re.compile(r"(?<!^)(?=[A-Z])")
 
+
+@functools.lru_cache(maxsize=None)
 def camel_to_lower(name):
-    return "".join(
-        "_" + w.lower() if w.isupper() else w.lower()
-        for w in name).lstrip("_")
+    return _CAMEL_RE.sub("_", name).lower().lstrip("_")
+
+
+@functools.lru_cache(maxsize=None)
+def _method_name(prefix, cls):
+    """name of the visitor method for a node class, eg. visit_search_field for SearchField
+    """
+    return prefix + camel_to_lower(cls.__name__)
 
 
 class TreeVisitor:
@@ -49,15 +59,9 @@ class TreeVisitor:
             meth = self._get_method_cache[type(node)]
         except KeyError:
             for cls in node.__class__.mro():
-                try:
-                    method_name = "{}{}".format(
-                        self.visitor_method_prefix,
-                        camel_to_lower(cls.__name__)
-                    )
-                    meth = getattr(self, method_name)
+                meth = getattr(self, _method_name(self.visitor_method_prefix, cls), None)
+                if meth is not None:
                     break
-                except AttributeError:
-                    continue
             else:
                 meth = getattr(self, self.generic_visitor_method_name)
             self._get_method_cache[type(node)] = meth
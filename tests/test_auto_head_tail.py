@@ -67,3 +67,20 @@ class AutoHeadTailTestCase(TestCase):
             str(auto_head_tail(tree)),
             "[foo\tTO\nbar]\rAND\n\nNOT\t\tbaz\r\rAND\t\nspam"
         )
+
+    def test_auto_head_tail_always_copies(self):
+        # even an already spaced tree is copied, so that the result can be changed safely
+        tree = AndOperation(
+            Range(Word("foo", tail=" "), Word("bar", head=" "), tail=" "),
+            Not(Word("baz", head=" "), head=" ", tail=" "),
+            Fuzzy(Word("spam"), head=" "),
+        )
+        new_tree = auto_head_tail(tree)
+        self.assertIsNot(new_tree, tree)
+        self.assertEqual(new_tree, tree)
+        new_tree.operands[0].low.value = "changed"
+        self.assertEqual(tree.operands[0].low.value, "foo")
+        # and it prints the same, whether other nodes needed spacing or not
+        spaced = str(new_tree).replace("changed", "foo")
+        tree.operands[0].low.tail = ""
+        self.assertEqual(str(auto_head_tail(tree)), spaced)
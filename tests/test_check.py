@@ -1,5 +1,10 @@
+import functools
+import gc
+import re
+import weakref
 from unittest import TestCase
 
+from luqum import check as check_module
 from luqum.check import LuceneCheck, CheckNestedFields
 from luqum.exceptions import NestedSearchFieldException, ObjectSearchFieldException
 from luqum.parser import parser
@@ -73,6 +78,20 @@ class TestCheck(TestCase):
         check_easy_going = LuceneCheck()
         self.assertTrue(check_easy_going(query))
 
+    def test_zeal_change(self):
+        query = OrOperation(Not(Word("foo")), Word("bar"))
+        check = LuceneCheck()
+        self.assertTrue(check(query))
+        check.zeal = 1
+        self.assertFalse(check(query))
+        check.zeal = 0
+        self.assertTrue(check(query))
+
+    def test_zealous_not_at_root(self):
+        check = LuceneCheck(zeal=1)
+        self.assertTrue(check(Not(Word("foo"))))
+        self.assertEqual(check.errors(Prohibit(Word("foo"))), [])
+
     def test_bad_field_name(self):
         check = LuceneCheck()
         query = SearchField("foo*", Word("bar"))
@@ -106,6 +125,16 @@ class TestCheck(TestCase):
         self.assertEqual(len(check.errors(query)), 1)
         self.assertIn("Invalid characters", check.errors(query)[0])
 
+    def test_word_space_and_invalid_characters(self):
+        query = Word("foo/bar baz")
+        check = LuceneCheck()
+        self.assertEqual(len(check.errors(query)), 1)
+        check = LuceneCheck(zeal=1)
+        errors = check.errors(query)
+        self.assertEqual(len(errors), 2)
+        self.assertIn("space", errors[0])
+        self.assertIn("Invalid characters", errors[1])
+
     def test_fuzzy_negative_degree(self):
         check = LuceneCheck()
         query = Fuzzy(Word("foo"), "-4.1")
@@ -135,6 +164,126 @@ class TestCheck(TestCase):
         self.assertIn("Unknown item type", check.errors(query)[0])
         self.assertIn("Unknown item type", check.errors(query)[1])
 
+    def test_custom_check_yielding_strings(self):
+
+        class CustomCheck(LuceneCheck):
+
+            def check_word(self, item, parent):
+                if item.value == "spam":
+                    yield "no spam please"
+
+        check = CustomCheck()
+        query = AndOperation(Word("spam"), Word("eggs"))
+        self.assertFalse(check(query))
+        self.assertEqual(check.errors(query), ["no spam please"])
+        self.assertEqual(list(check.check(query)), ["no spam please"])
+
+    def test_deep_tree(self):
+        check = LuceneCheck()
+        query = Word("foo bar")
+        for i in range(5000):
+            query = Group(query)
+        self.assertFalse(check(query))
+        self.assertEqual(len(check.errors(query)), 1)
+        self.assertIn("space", check.errors(query)[0])
+
+    def test_errors_order(self):
+        check = LuceneCheck()
+        query = AndOperation(
+            SearchField("foo*", Word("a b")),
+            Fuzzy(Phrase('"c"'), "-1"))
+        errors = check.errors(query)
+        self.assertEqual(len(errors), 4)
+        self.assertIn("not a valid field name", errors[0])
+        self.assertIn("space", errors[1])
+        self.assertIn("invalid degree", errors[2])
+        self.assertIn("single term", errors[3])
+
+    def test_errors_go_through_check(self):
+        class FilteringCheck(LuceneCheck):
+            def check(self, item, parents=()):
+                return (e for e in super().check(item, parents) if "space" not in e)
+
+        query = AndOperation(Word("a b"), Word("c"))
+        check = FilteringCheck()
+        self.assertTrue(check(query))
+        self.assertEqual(check.errors(query), [])
+
+    def test_check_is_lazy(self):
+        class StrictCheck(LuceneCheck):
+            def check_word(self, item, parent):
+                if item.value == "boom":
+                    raise AssertionError("checked too far")
+                yield from super().check_word(item, parent)
+
+        query = AndOperation(Word("a b"), Word("boom"))
+        check = StrictCheck()
+        self.assertIn("space", next(check.check(query)))
+        self.assertFalse(check(query))
+
+    def test_overridden_checkers_are_called(self):
+        def also_no_range(f):
+            @functools.wraps(f)  # this copies markers of f
+            def wrapper(self, item, parent):
+                yield from f(self, item, parent)
+                yield "no range"
+            return wrapper
+
+        class ExtraCheck(LuceneCheck):
+            check_range = also_no_range(LuceneCheck.check_range)
+
+            def _check_not_operator(self, item, parent):
+                yield "no not"
+
+        query = AndOperation(Range(Word("1"), Word("2")), Not(Word("a")))
+        self.assertEqual(ExtraCheck().errors(query), ["no range", "no not"])
+        self.assertEqual(LuceneCheck().errors(query), [])
+
+    def test_custom_container_children_are_checked(self):
+        class MyGroup(Group):
+            pass
+
+        class MyCheck(LuceneCheck):
+            def check_my_group(self, item, parent):
+                return iter([])
+
+        query = MyGroup(Word("a b"))
+        self.assertEqual(
+            MyCheck().errors(query), ["A single term value can't hold a space a b"])
+
+    def test_overridden_patterns(self):
+        class LaxCheck(LuceneCheck):
+            field_name_re = re.compile(r"^[\w.]+$")
+            space_re = re.compile(r"\t")
+
+        query = SearchField("foo.bar", Word("a b"))
+        self.assertEqual(LaxCheck().errors(query), [])
+        self.assertEqual(len(LuceneCheck().errors(query)), 2)
+
+    def test_overridden_patterns_zeal(self):
+        class LaxCheck(LuceneCheck):
+            space_re = re.compile(r"\t")
+            invalid_term_chars_re = re.compile(r"[!]")
+
+        query = AndOperation(Word("a b-c"), Word("d!"))
+        self.assertEqual(
+            LaxCheck(zeal=1).errors(query), ["Invalid characters in term value: d!"])
+
+    def test_checker_classes_are_not_kept_alive(self):
+        class TmpCheck(LuceneCheck):
+            pass
+
+        self.assertEqual(TmpCheck().errors(Word("a")), [])
+        ref = weakref.ref(TmpCheck)
+        del TmpCheck
+        gc.collect()
+        self.assertIsNone(ref())
+
+    def test_module_helpers(self):
+        self.assertEqual(check_module.camel_to_lower("BaseOperation"), "base_operation")
+        with self.assertWarns(DeprecationWarning):
+            self.assertEqual(check_module.sign(-2), -1)
+
 
 class CheckVisitorTestCase(TestCase):
 
@@ -4,6 +4,7 @@
 """
 import collections
 import copy
+import warnings
 from unittest import TestCase
 
 from luqum.tree import Group, Word, Phrase, AndOperation, OrOperation
@@ -62,6 +63,54 @@ class TreeVisitorTestCase(TestCase):
         result = visitor.visit(tree)
         self.assertEqual(list(result), ['a BASE_OP b', 'a', 'b'])
 
+    def test_parents(self):
+        class ParentsVisitor(LuceneTreeVisitor):
+            def generic_visit(self, node, parents):
+                yield node, list(parents)
+
+        foo, bar, baz = Word("foo"), Word("bar"), Word("baz")
+        group = Group(AndOperation(foo, bar))
+        tree = OrOperation(group, baz)
+        operation = group.expr
+        self.assertEqual(
+            list(ParentsVisitor().visit(tree)),
+            [
+                (tree, []),
+                (group, [tree]),
+                (operation, [tree, group]),
+                (foo, [tree, group, operation]),
+                (bar, [tree, group, operation]),
+                (baz, [tree]),
+            ],
+        )
+
+    def test_deprecation_warning(self):
+        with self.assertWarns(DeprecationWarning):
+            visitor = self.BasicVisitor()
+        # visiting does not warn again
+        with warnings.catch_warnings():
+            warnings.simplefilter("error")
+            list(visitor.visit(AndOperation(Word("foo"), Word("bar"))))
+
+    def test_deprecation_warning_without_init(self):
+        class NoInitVisitor(self.BasicVisitor):
+            def __init__(self):
+                pass
+
+        visitor = NoInitVisitor()
+        with self.assertWarns(DeprecationWarning):
+            list(visitor.visit(Word("foo")))
+
+    def test_deep_tree(self):
+        # deep trees do not hit the recursion limit
+        tree = Word("foo")
+        for i in range(5000):
+            tree = Group(tree)
+        visitor = self.BasicVisitor()
+        nodes = list(visitor.visit(tree))
+        self.assertEqual(len(nodes), 5001)
+        self.assertEqual(nodes[-1], Word("foo"))
+
 
 class TreeTransformerTestCase(TestCase):
 
@@ -177,6 +226,36 @@ class TreeTransformerTestCase(TestCase):
         same_tree = LuceneTreeTransformer().visit(copy.deepcopy(tree))
         self.assertEqual(same_tree, tree)
 
+    def test_replace_node_by_identity(self):
+        # equal siblings are not mistaken for the replaced node
+        first, second = Word("foo"), Word("foo")
+        tree = AndOperation(first, second)
+        transformer = self.BasicTransformer()
+        transformer.replace_node(second, Word("bar"), tree)
+        self.assertEqual(tree, AndOperation(Word("foo"), Word("bar")))
+        self.assertIs(tree.children[0], first)
+        group = Group(first)
+        transformer.replace_node(first, second, group)
+        self.assertIs(group.expr, second)
+
+    def test_deep_tree(self):
+        # deep trees do not hit the recursion limit
+        tree = Word("foo")
+        for i in range(5000):
+            tree = Group(tree)
+        transformer = self.BasicTransformer()
+        new_tree = transformer.visit(tree)
+        for i in range(5000):
+            new_tree = new_tree.expr
+        self.assertEqual(new_tree, Word("lol"))
+
+    def test_with_parents(self):
+        tree = AndOperation(Word("foo"), Word("bar"))
+        transformer = self.BasicTransformer()
+        new_word = transformer.visit(tree.children[0], parents=[tree])
+        self.assertEqual(new_word, Word("lol"))
+        self.assertEqual(tree, AndOperation(Word("lol"), Word("bar")))
+
 
 class TreeVisitorV2TestCase(TestCase):
 
@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from luqum.elasticsearch.tree import EShould, EWord
+from luqum.elasticsearch.tree import EMust, ENested, EPhrase, ERange, EShould, EWord
 
 
 class TestItems(TestCase):
@@ -18,3 +18,71 @@ class TestItems(TestCase):
                 'minimum_should_match': 2,
             }},
         )
+
+    def test_method_follows_changes(self):
+        word = EWord(q="a", method="match")
+        self.assertEqual(word.method, "match")
+        word.q = "a*"
+        self.assertEqual(word.method, "query_string")
+        word = EWord(q="a", no_analyze=["text"], fields=["text"])
+        self.assertEqual(word.method, "term")
+        word.fuzziness = 2
+        self.assertEqual(word.method, "fuzzy")
+        word.q = "a?"
+        self.assertEqual(word.method, "wildcard")
+
+    def test_items_have_slots(self):
+        items = [
+            EWord(q="a"), EPhrase('"a b"'), ERange(lt=1), EShould(items=[]), EMust(items=[]),
+        ]
+        for item in items:
+            with self.subTest(item=item):
+                self.assertFalse(hasattr(item, "__dict__"))
+
+    def test_additional_keys_in_subclass(self):
+        class TaggedEWord(EWord):
+            ADDITIONAL_KEYS_TO_ADD = EWord.ADDITIONAL_KEYS_TO_ADD + ("tag",)
+            tag = "x"
+
+        self.assertEqual(
+            TaggedEWord(q="a", fields=["text"]).json,
+            {'term': {'text': {'value': 'a', 'tag': 'x'}}},
+        )
+
+    def test_nested_excludes_children_on_same_path(self):
+        def nested(path, items):
+            return ENested(nested_path=path, nested_fields=[], items=items)
+
+        word = EWord(q="a", fields=["a", "b"])
+        other = nested("b", EWord(q="b", fields=["b", "c"]))
+        tree = nested("a", EShould(items=[nested("a", nested("a", word)), other]))
+        self.assertEqual(
+            nested("a", tree).json,
+            {"nested": {"path": "a", "query": {"bool": {"should": [
+                {"term": {"a.b": {"value": "a"}}},
+                {"nested": {"path": "b", "query": {"term": {"b.c": {"value": "b"}}}}},
+            ]}}}},
+        )
+
+    def test_nested_deep_tree(self):
+        tree = EWord(q="a", fields=["a", "b"])
+        for i in range(1000):
+            tree = EMust(items=[ENested(nested_path="a", nested_fields=[], items=tree)])
+        node = ENested(nested_path="a", nested_fields=[], items=tree)
+        depth = 0
+        item = node.items
+        while isinstance(item, EMust):
+            item, = item.items
+            depth += 1
+        self.assertEqual(depth, 1000)
+        self.assertIsInstance(item, EWord)
+
+    def test_phrase_spaces(self):
+        for phrase, expected in [
+            ('"a b"', "a b"),
+            ('"a \t\r\n b"', "a b"),
+            ('" a  b "', " a b "),
+            ('\n"a b"\n', '"a b"'),
+        ]:
+            with self.subTest(phrase=phrase):
+                self.assertEqual(EPhrase(phrase).q, expected)
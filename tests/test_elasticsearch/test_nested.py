@@ -142,3 +142,26 @@ class NestedQueriesTestCase(TestCase):
         query = [{"query": term, "_name": "spam"}, {"query": term, "_name": "beurre"}]
         name = get_first_name(query)
         self.assertEqual(name, "spam")
+
+    def test_nested_bool_with_multiple_operations(self):
+        term1 = {"term": {"text": {"value": "spam", "_name": "spam"}}}
+        term2 = {"term": {"text": {"value": "ham", "_name": "ham"}}}
+        bool_query = {"bool": {"must": term1, "must_not": [term2]}}
+        queries = extract_nested_queries({"nested": {"path": "my", "query": bool_query}})
+        self.assertEqual(
+            queries,
+            [
+                {"nested": {"path": "my", "query": term1, "_name": "spam"}},
+                {"nested": {"path": "my", "query": term2, "_name": "ham"}},
+            ],
+        )
+
+    def test_get_first_name_depth_first(self):
+        query = {
+            "nested": {"query": {"bool": {"must": [{"term": {"_name": "in_bool"}}]}}},
+            "other": [{"term": {"text": {"value": "bar"}}}, {"term": {"_name": "spam"}}],
+            "last": {"_name": "ham"},
+        }
+        self.assertEqual(get_first_name(query), "spam")
+        self.assertIsNone(get_first_name({"bool": {"_name": "spam"}}))
+        self.assertIsNone(get_first_name("spam"))
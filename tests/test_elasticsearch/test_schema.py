@@ -174,3 +174,37 @@ class SchemaAnalyzerTestCase(TestCase):
         self.assertEqual(list(s.not_analyzed_fields()), [])
         self.assertEqual(s.nested_fields(), {})
         self.assertEqual(list(s.object_fields()), [])
+
+    def test_query_builder_options(self):
+        s = SchemaAnalyzer(self.INDEX_SETTINGS)
+        options = s.query_builder_options()
+        self.assertEqual(options["default_field"], "text")
+        self.assertEqual(options["not_analyzed_fields"], list(s.not_analyzed_fields()))
+        self.assertEqual(options["nested_fields"], s.nested_fields())
+        self.assertEqual(options["object_fields"], list(s.object_fields()))
+
+    def test_results_are_cached(self):
+        s = SchemaAnalyzer(self.INDEX_SETTINGS)
+        options = s.query_builder_options()
+        # modifying results does not affect cached values
+        options["nested_fields"]["author"].clear()
+        options["object_fields"].clear()
+        self.assertEqual(s.query_builder_options()["nested_fields"], s.nested_fields())
+        self.assertIn("book", s.nested_fields()["author"])
+        self.assertEqual(len(list(s.object_fields())), 4)
+
+    def test_mappings(self):
+        s = SchemaAnalyzer(self.INDEX_SETTINGS)
+        if ES_6:
+            self.assertEqual(s.mappings, {"_doc": self.MAPPING})
+        else:
+            self.assertEqual(s.mappings, {"type1": self.MAPPING})
+
+    def test_set_mappings(self):
+        s = SchemaAnalyzer(self.INDEX_SETTINGS)
+        self.assertIn("author", s.nested_fields())
+        mappings = {"_doc": {"properties": {"tags": {"type": "keyword"}}}}
+        s.mappings = mappings
+        self.assertEqual(s.mappings, mappings)
+        self.assertEqual(s.nested_fields(), {})
+        self.assertEqual(list(s.not_analyzed_fields()), ["tags"])
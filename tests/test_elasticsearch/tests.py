@@ -1,3 +1,4 @@
+import functools
 from unittest import TestCase
 
 from luqum.exceptions import (
@@ -11,6 +12,35 @@ from luqum.elasticsearch.tree import ElasticSearchItemFactory
 from luqum.elasticsearch.visitor import EWord, ElasticsearchQueryBuilder
 
 
+@functools.lru_cache(maxsize=None)
+def _parse(query):
+    """parse query, parsed trees are shared, as query builders do not modify them
+    """
+    return parser.parse(query)
+
+
+def _nested_operations(op_cls, *values):
+    """build right nested operations on words, eg. a AND (b AND (c AND d))
+    """
+    tree = Word(values[-1])
+    for value in reversed(values[:-1]):
+        tree = op_cls(Word(value), tree)
+    return tree
+
+
+@functools.lru_cache(maxsize=None)
+def _query_builder(
+        default_operator=ElasticsearchQueryBuilder.SHOULD, default_field="text",
+        not_analyzed_fields=frozenset()):
+    """a query builder for simple options, shared between tests (it is stateless)
+    """
+    return ElasticsearchQueryBuilder(
+        default_operator=default_operator,
+        default_field=default_field,
+        not_analyzed_fields=not_analyzed_fields,
+    )
+
+
 class ElasticsearchTreeTransformerTestCase(TestCase):
 
     @classmethod
@@ -24,6 +54,13 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
             object_fields=["book.title", "author.rewards.name"],
             sub_fields=["book.title.raw"],
         )
+        # trees are not modified by query builder, so they can be shared by tests
+        cls.TREE_AND = AndOperation(Word('spam'), Word('eggs'), Word('foo'))
+        cls.EXPECTED_AND = {'bool': {'must': [
+            {"term": {"text": {"value": 'spam'}}},
+            {"term": {"text": {"value": 'eggs'}}},
+            {"term": {"text": {"value": 'foo'}}},
+        ]}}
 
     def test_override_element(self):
         class CustomEWord(EWord):
@@ -35,8 +72,7 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
             E_WORD = CustomEWord
 
         transformer = CustomQueryBuilder()
-        tree = AndOperation(Word('spam'), Word('eggs'), Word('foo'))
-        result = transformer(tree)
+        result = transformer(self.TREE_AND)
         expected = {'bool': {'must': [
             {"custom": 'spam'},
             {"custom": 'eggs'},
@@ -55,42 +91,189 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
         with self.assertRaises(ObjectSearchFieldException):
             self.transformer(tree)
 
-        tree = AndOperation(Word('spam'), Word('eggs'), Word('foo'))
-        result = self.transformer(tree)
-        expected = {'bool': {'must': [
-            {"term": {"text": {"value": 'spam'}}},
-            {"term": {"text": {"value": 'eggs'}}},
-            {"term": {"text": {"value": 'foo'}}},
-        ]}}
-        self.assertDictEqual(result, expected)
+        result = self.transformer(self.TREE_AND)
+        self.assertDictEqual(result, self.EXPECTED_AND)
 
     def test_should_transform_and(self):
-        tree = AndOperation(Word('spam'), Word('eggs'), Word('foo'))
-        result = self.transformer(tree)
-        expected = {'bool': {'must': [
-            {"term": {"text": {"value": 'spam'}}},
-            {"term": {"text": {"value": 'eggs'}}},
-            {"term": {"text": {"value": 'foo'}}},
-        ]}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_plus(self):
-        tree = Plus(Word("spam"))
-        result = self.transformer(tree)
-        expected = {'bool': {'must': [
-            {"term": {"text": {"value": 'spam'}}},
-        ]}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_or(self):
-        tree = OrOperation(Word('spam'), Word('eggs'), Word('foo'))
-        result = self.transformer(tree)
-        expected = {'bool': {'should': [
-            {"term": {"text": {"value": 'spam'}}},
-            {"term": {"text": {"value": 'eggs'}}},
-            {"term": {"text": {"value": 'foo'}}},
-        ]}}
-        self.assertDictEqual(result, expected)
+        result = self.transformer(self.TREE_AND)
+        self.assertDictEqual(result, self.EXPECTED_AND)
+
+    def test_should_transform(self):
+        # simple cases, as (description, tree, expected query)
+        cases = [
+            (
+                "plus",
+                Plus(Word("spam")),
+                {'bool': {'must': [
+                    {"term": {"text": {"value": 'spam'}}},
+                ]}},
+            ),
+            (
+                "or",
+                OrOperation(Word('spam'), Word('eggs'), Word('foo')),
+                {'bool': {'should': [
+                    {"term": {"text": {"value": 'spam'}}},
+                    {"term": {"text": {"value": 'eggs'}}},
+                    {"term": {"text": {"value": 'foo'}}},
+                ]}},
+            ),
+            (
+                "prohibit",
+                Prohibit(Word("spam")),
+                {'bool': {'must_not': [
+                    {"term": {"text": {"value": 'spam'}}},
+                ]}},
+            ),
+            (
+                "not",
+                Not(Word('spam')),
+                {'bool': {'must_not': [
+                    {"term": {"text": {"value": 'spam'}}},
+                ]}},
+            ),
+            (
+                "word",
+                Word('spam'),
+                {"term": {"text": {"value": 'spam'}}},
+            ),
+            (
+                "phrase",
+                SearchField("foo", Phrase('"spam eggs"')),
+                {"match_phrase": {"foo": {"query": 'spam eggs'}}},
+            ),
+            (
+                "empty phrase",
+                SearchField("foo", Phrase('""')),
+                {"match_phrase": {"foo": {"query": ''}}},
+            ),
+            (
+                "phrase with search field",
+                SearchField('monthy', Phrase('"spam eggs"')),
+                {"match_phrase": {"monthy": {"query": 'spam eggs'}}},
+            ),
+            (
+                "search field",
+                SearchField("pays", Word("spam")),
+                {"match": {"pays": {"query": 'spam', 'zero_terms_query': 'none'}}},
+            ),
+            (
+                "unknown operation default",
+                UnknownOperation(Word("spam"), Word("eggs")),
+                {'bool': {'should': [
+                    {"term": {"text": {"value": 'spam'}}},
+                    {"term": {"text": {"value": 'eggs'}}},
+                ]}},
+            ),
+            (
+                "boost in word",
+                Boost(Word("spam"), 1),
+                {"term": {"text": {"value": 'spam', "boost": 1.00}}},
+            ),
+            (
+                "wildcard in word",
+                Word("spam*"),
+                {"wildcard": {"text": {"value": 'spam*'}}},
+            ),
+            (
+                "boost in search field",
+                SearchField("spam", Boost(Word("egg"), 1)),
+                {
+                    "match": {
+                        "spam": {
+                            "query": 'egg', "boost": 1.0, 'zero_terms_query': 'none',
+                        },
+                    },
+                },
+            ),
+            (
+                "fuzzy in word",
+                Fuzzy(Word("spam"), 1),
+                {"fuzzy": {"text": {"value": 'spam', "fuzziness": 1.00}}},
+            ),
+            (
+                "fuzzy in search field",
+                SearchField("spam", Fuzzy(Word("egg"), 1)),
+                {"fuzzy": {"spam": {"value": 'egg', "fuzziness": 1.0}}},
+            ),
+            (
+                "proximity in word",
+                SearchField("foo", Proximity(Phrase('"spam and eggs"'), 1)),
+                {"match_phrase": {
+                    "foo": {"query": "spam and eggs", "slop": 1.0}
+                }},
+            ),
+            (
+                "proximity in search field",
+                SearchField("spam", Proximity(Phrase('"Life of Bryan"'), 1)),
+                {"match_phrase": {
+                    "spam": {"query": "Life of Bryan", "slop": 1.0}
+                }},
+            ),
+            (
+                "proximity in fuzzy for term",
+                SearchField("not_analyzed_field", Proximity(Phrase('"Life of Bryan"'), 2)),
+                {"fuzzy": {
+                    "not_analyzed_field": {"value": "Life of Bryan", "fuzziness": 2.0}
+                }},
+            ),
+            (
+                "range gte only",
+                Range(
+                    low=Word('1'),
+                    high=Word('*'),
+                    include_low=True,
+                    include_high=True,
+                ),
+                {"range": {"text": {"gte": '1'}}},
+            ),
+            (
+                "range in search field",
+                SearchField("spam", Range(
+                    low=Word('1'),
+                    high=Word('10'),
+                    include_low=True,
+                    include_high=False,
+                )),
+                {"range": {"spam": {'lt': '10', 'gte': '1'}}},
+            ),
+            (
+                "group",
+                AndOperation(Word("spam"), Group(AndOperation(Word("monty"), Word("python")))),
+                {'bool': {'must': [
+                    {'term': {'text': {'value': 'spam'}}},
+                    {'bool': {'must': [
+                        {'term': {'text': {'value': 'monty'}}},
+                        {'term': {'text': {'value': 'python'}}},
+                    ]}}
+                ]}},
+            ),
+            (
+                "field group",
+                SearchField("spam", FieldGroup(AndOperation(Word("monty"), Word("python")))),
+                {'bool': {'must': [
+                    {'match': {'spam': {'query': 'monty', 'zero_terms_query': 'all'}}},
+                    {'match': {'spam': {'query': 'python', 'zero_terms_query': 'all'}}},
+                ]}},
+            ),
+        ]
+        for description, tree, expected in cases:
+            with self.subTest(description):
+                result = self.transformer(tree)
+                self.assertDictEqual(result, expected)
+
+    def test_should_transform_range_bounds(self):
+        # include_low, include_high, expected bounds
+        cases = [
+            (True, True, {"gte": '1', "lte": '10'}),
+            (False, False, {"gt": '1', "lt": '10'}),
+            (True, False, {"gte": '1', "lt": '10'}),
+            (False, True, {"gt": '1', "lte": '10'}),
+        ]
+        for include_low, include_high, expected in cases:
+            with self.subTest(include_low=include_low, include_high=include_high):
+                tree = Range(Word('1'), Word('10'), include_low, include_high)
+                result = self.transformer(tree)
+                self.assertDictEqual(result, {"range": {"text": expected}})
 
     def test_bool_transform_bool(self):
         tree = BoolOperation(
@@ -115,6 +298,16 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
         }}
         self.assertDictEqual(result, expected)
 
+    def test_boost_on_operation(self):
+        # boost is not rendered on bool queries, but must not fail
+        tree = Boost(Group(AndOperation(Word("spam"), Word("eggs"))), force=2)
+        result = self.transformer(tree)
+        expected = {'bool': {'must': [
+            {"term": {"text": {"value": 'spam'}}},
+            {"term": {"text": {"value": 'eggs'}}},
+        ]}}
+        self.assertDictEqual(result, expected)
+
     def test_should_raise_when_or_and_and_on_same_level(self):
         tree = OrOperation(
             Word('spam'),
@@ -132,9 +325,9 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
             self.transformer(tree)
 
     def test_should_raise_when_or_and_not_on_same_level(self):
-        transformer = ElasticsearchQueryBuilder(
+        transformer = _query_builder(
             default_field="text",
-            not_analyzed_fields=['not_analyzed_field', 'text'],
+            not_analyzed_fields=frozenset(['not_analyzed_field', 'text']),
             default_operator=ElasticsearchQueryBuilder.MUST
         )
         tree = OrOperation(
@@ -145,9 +338,9 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
             transformer(tree)
 
     def test_should_raise_when_or_and_not_on_same_level2(self):
-        transformer = ElasticsearchQueryBuilder(
+        transformer = _query_builder(
             default_field="text",
-            not_analyzed_fields=['not_analyzed_field', 'text'],
+            not_analyzed_fields=frozenset(['not_analyzed_field', 'text']),
             default_operator=ElasticsearchQueryBuilder.MUST
         )
         tree = UnknownOperation(
@@ -158,9 +351,9 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
             transformer(tree)
 
     def test_should_raise_when_or_and_not_on_same_level3(self):
-        transformer = ElasticsearchQueryBuilder(
+        transformer = _query_builder(
             default_field="text",
-            not_analyzed_fields=['not_analyzed_field', 'text'],
+            not_analyzed_fields=frozenset(['not_analyzed_field', 'text']),
             default_operator=ElasticsearchQueryBuilder.MUST
         )
         tree = UnknownOperation(
@@ -174,28 +367,6 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
         with self.assertRaises(OrAndAndOnSameLevel):
             transformer(tree)
 
-    def test_should_transform_prohibit(self):
-        tree = Prohibit(Word("spam"))
-        result = self.transformer(tree)
-        expected = {'bool': {'must_not': [
-            {"term": {"text": {"value": 'spam'}}},
-        ]}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_not(self):
-        tree = Not(Word('spam'))
-        result = self.transformer(tree)
-        expected = {'bool': {'must_not': [
-            {"term": {"text": {"value": 'spam'}}},
-        ]}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_word(self):
-        tree = Word('spam')
-        result = self.transformer(tree)
-        expected = {"term": {"text": {"value": 'spam'}}}
-        self.assertDictEqual(result, expected)
-
     def test_should_transform_start_to_exists(self):
         tree = Word("*")
         result = self.transformer(tree)
@@ -209,9 +380,9 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
         self.assertDictEqual(result, expected)
 
     def test_should_transform_word_with_custom_search_field(self):
-        transformer = ElasticsearchQueryBuilder(
+        transformer = _query_builder(
             default_field="custom",
-            not_analyzed_fields=['custom']
+            not_analyzed_fields=frozenset(['custom'])
         )
         tree = Word('spam')
         result = transformer(tree)
@@ -239,51 +410,17 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
         expected = {"match_phrase": {"foo": {"query": r'spam\\*'}}}
         self.assertDictEqual(result, expected)
 
-    def test_should_transform_phrase(self):
-        tree = SearchField("foo", Phrase('"spam eggs"'))
-        result = self.transformer(tree)
-        expected = {"match_phrase": {"foo": {"query": 'spam eggs'}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_empty_phrase(self):
-        tree = SearchField("foo", Phrase('""'))
-        result = self.transformer(tree)
-        expected = {"match_phrase": {"foo": {"query": ''}}}
-        self.assertDictEqual(result, expected)
-
     def test_should_transform_phrase_with_custom_search_field(self):
-        transformer = ElasticsearchQueryBuilder(default_field="custom")
+        transformer = _query_builder(default_field="custom")
         tree = Phrase('"spam eggs"')
         result = transformer(tree)
         expected = {"match_phrase": {"custom": {"query": 'spam eggs'}}}
         self.assertDictEqual(result, expected)
 
-    def test_should_transform_phrase_with_search_field(self):
-        tree = SearchField('monthy', Phrase('"spam eggs"'))
-        result = self.transformer(tree)
-        expected = {"match_phrase": {"monthy": {"query": 'spam eggs'}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_search_field(self):
-        tree = SearchField("pays", Word("spam"))
-        result = self.transformer(tree)
-        expected = {
-            "match": {"pays": {"query": 'spam', 'zero_terms_query': 'none'}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_unknown_operation_default(self):
-        tree = UnknownOperation(Word("spam"), Word("eggs"))
-        result = self.transformer(tree)
-        expected = {'bool': {'should': [
-            {"term": {"text": {"value": 'spam'}}},
-            {"term": {"text": {"value": 'eggs'}}},
-        ]}}
-        self.assertDictEqual(result, expected)
-
     def test_should_transform_unknown_operation_default_must(self):
-        transformer = ElasticsearchQueryBuilder(
+        transformer = _query_builder(
             default_operator=ElasticsearchQueryBuilder.MUST,
-            not_analyzed_fields=['text']
+            not_analyzed_fields=frozenset(['text'])
         )
         tree = UnknownOperation(Word("spam"), Word("eggs"))
         result = transformer(tree)
@@ -294,9 +431,9 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
         self.assertDictEqual(result, expected)
 
     def test_should_transform_unknown_operation_default_should(self):
-        transformer = ElasticsearchQueryBuilder(
+        transformer = _query_builder(
             default_operator=ElasticsearchQueryBuilder.SHOULD,
-            not_analyzed_fields=['text']
+            not_analyzed_fields=frozenset(['text'])
         )
         tree = UnknownOperation(Word("spam"), Word("eggs"))
         result = transformer(tree)
@@ -307,16 +444,7 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
         self.assertDictEqual(result, expected)
 
     def test_should_simplify_nested_and(self):
-        tree = AndOperation(
-            Word("spam"),
-            AndOperation(
-                Word("eggs"),
-                AndOperation(
-                    Word("monthy"),
-                    Word("python")
-                )
-            )
-        )
+        tree = _nested_operations(AndOperation, "spam", "eggs", "monthy", "python")
         result = self.transformer(tree)
         expected = {'bool': {'must': [
             {"term": {"text": {"value": 'spam'}}},
@@ -327,16 +455,7 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
         self.assertDictEqual(result, expected)
 
     def test_should_simplify_nested_or(self):
-        tree = OrOperation(
-            Word("spam"),
-            OrOperation(
-                Word("eggs"),
-                OrOperation(
-                    Word("monthy"),
-                    Word("python")
-                )
-            )
-        )
+        tree = _nested_operations(OrOperation, "spam", "eggs", "monthy", "python")
         result = self.transformer(tree)
         expected = {'bool': {'should': [
             {"term": {"text": {"value": 'spam'}}},
@@ -346,6 +465,12 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
         ]}}
         self.assertDictEqual(result, expected)
 
+    def test_simplify_deeply_nested_operations(self):
+        values = ["w%d" % i for i in range(3000)]
+        tree = _nested_operations(AndOperation, *values)
+        children = self.transformer.simplify_if_same(tree.children, tree)
+        self.assertEqual([child.value for child in children], values)
+
     def test_should_not_simplify_nested_or_in_and(self):
         tree = AndOperation(
             Word("spam"),
@@ -361,159 +486,12 @@ class ElasticsearchTreeTransformerTestCase(TestCase):
         with self.assertRaises(OrAndAndOnSameLevel):
             self.transformer(tree)
 
-    def test_should_transform_boost_in_word(self):
-        tree = Boost(Word("spam"), 1)
-        result = self.transformer(tree)
-        expected = {"term": {"text": {"value": 'spam', "boost": 1.00}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_wildcard_in_word(self):
-        tree = Word("spam*")
-        result = self.transformer(tree)
-        expected = {"wildcard": {"text": {"value": 'spam*'}}}
-        self.assertDictEqual(result, expected)
-
     def test_should_not_transform_escaped_wildcard(self):
         tree = Word(r"spam\*")
         result = self.transformer(tree)
         expected = {"term": {"text": {"value": r'spam\*'}}}
         self.assertDictEqual(result, expected)
 
-    def test_should_transform_boost_in_search_field(self):
-        tree = SearchField("spam", Boost(Word("egg"), 1))
-        result = self.transformer(tree)
-        expected = {
-            "match": {
-                "spam": {
-                    "query": 'egg', "boost": 1.0, 'zero_terms_query': 'none',
-                },
-            },
-        }
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_fuzzy_in_word(self):
-        tree = Fuzzy(Word("spam"), 1)
-        result = self.transformer(tree)
-        expected = {"fuzzy": {"text": {"value": 'spam', "fuzziness": 1.00}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_fuzzy_in_search_field(self):
-        tree = SearchField("spam", Fuzzy(Word("egg"), 1))
-        result = self.transformer(tree)
-        expected = {"fuzzy": {"spam": {"value": 'egg', "fuzziness": 1.0}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_proximity_in_word(self):
-        tree = SearchField("foo", Proximity(Phrase('"spam and eggs"'), 1))
-        result = self.transformer(tree)
-        expected = {"match_phrase": {
-            "foo": {"query": "spam and eggs", "slop": 1.0}
-        }}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_proximity_in_search_field(self):
-        tree = SearchField("spam", Proximity(Phrase('"Life of Bryan"'), 1))
-        result = self.transformer(tree)
-        expected = {"match_phrase": {
-            "spam": {"query": "Life of Bryan", "slop": 1.0}
-        }}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_proximity_in_fuzzy_for_term(self):
-        tree = SearchField("not_analyzed_field", Proximity(Phrase('"Life of Bryan"'), 2))
-        result = self.transformer(tree)
-        expected = {"fuzzy": {
-            "not_analyzed_field": {"value": "Life of Bryan", "fuzziness": 2.0}
-        }}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_range_lte_gte(self):
-        tree = Range(
-            low=Word('1'),
-            high=Word('10'),
-            include_low=True,
-            include_high=True,
-        )
-        result = self.transformer(tree)
-        expected = {"range": {"text": {"lte": '10', "gte": '1'}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_range_gte_only(self):
-        tree = Range(
-            low=Word('1'),
-            high=Word('*'),
-            include_low=True,
-            include_high=True,
-        )
-        result = self.transformer(tree)
-        expected = {"range": {"text": {"gte": '1'}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_range_lt_gt(self):
-        tree = Range(
-            low=Word('1'),
-            high=Word('10'),
-            include_low=False,
-            include_high=False,
-        )
-        result = self.transformer(tree)
-        expected = {"range": {"text": {"lt": '10', "gt": '1'}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_range_lte_gt(self):
-        tree = Range(
-            low=Word('1'),
-            high=Word('10'),
-            include_low=True,
-            include_high=False,
-        )
-        result = self.transformer(tree)
-        expected = {"range": {"text": {"lt": '10', "gte": '1'}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_range_lt_gte(self):
-        tree = Range(
-            low=Word('1'),
-            high=Word('10'),
-            include_low=False,
-            include_high=True,
-        )
-        result = self.transformer(tree)
-        expected = {"range": {"text": {"lte": '10', "gt": '1'}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_range_in_search_field(self):
-        tree = SearchField("spam", Range(
-            low=Word('1'),
-            high=Word('10'),
-            include_low=True,
-            include_high=False,
-        ))
-        result = self.transformer(tree)
-        expected = {"range": {"spam": {'lt': '10', 'gte': '1'}}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_group(self):
-        tree = AndOperation(Word("spam"), Group(AndOperation(Word("monty"), Word("python"))))
-        result = self.transformer(tree)
-        expected = {'bool': {'must': [
-            {'term': {'text': {'value': 'spam'}}},
-            {'bool': {'must': [
-                {'term': {'text': {'value': 'monty'}}},
-                {'term': {'text': {'value': 'python'}}},
-            ]}}
-        ]}}
-        self.assertDictEqual(result, expected)
-
-    def test_should_transform_field_group(self):
-        tree = SearchField("spam", FieldGroup(AndOperation(Word("monty"), Word("python"))))
-        result = self.transformer(tree)
-        expected = {'bool': {'must': [
-            {'match': {'spam': {'query': 'monty', 'zero_terms_query': 'all'}}},
-            {'match': {'spam': {'query': 'python', 'zero_terms_query': 'all'}}},
-        ]}}
-        self.assertDictEqual(result, expected)
-
     def test_no_analyze_should_follow_nested(self):
         tree = SearchField(
             "author",
@@ -728,33 +706,33 @@ class ElasticsearchTreeTransformerRealQueriesTestCase(TestCase):
     """Those are tests issued from bugs found thanks to jurismarches requests
     """
 
+    NO_ANALYZE = frozenset([
+        "type", "statut", "pays", "pays_acheteur", "pays_acheteur_display",
+        "refW", "pays_execution", "dept", "region", "dept_acheteur",
+        "dept_acheteur_display", "dept_execution", "flux", "sourceU",
+        "url", "refA", "thes", "modele", "ii", "iqi", "idc",
+        "critere_special", "auteur", "doublons", "doublons_de",
+        "resultats", "resultat_de", "rectifie_par", "rectifie",
+        "profils_en_cours", "profils_exclus", "profils_historiques"
+    ])
+
     @classmethod
     def setUpClass(cls):
-        NO_ANALYZE = [
-            "type", "statut", "pays", "pays_acheteur", "pays_acheteur_display",
-            "refW", "pays_execution", "dept", "region", "dept_acheteur",
-            "dept_acheteur_display", "dept_execution", "flux", "sourceU",
-            "url", "refA", "thes", "modele", "ii", "iqi", "idc",
-            "critere_special", "auteur", "doublons", "doublons_de",
-            "resultats", "resultat_de", "rectifie_par", "rectifie",
-            "profils_en_cours", "profils_exclus", "profils_historiques"
-        ]
-
         cls.transformer = ElasticsearchQueryBuilder(
             default_field="text",
-            not_analyzed_fields=NO_ANALYZE,
+            not_analyzed_fields=cls.NO_ANALYZE,
             default_operator=ElasticsearchQueryBuilder.MUST,
         )
 
     def test_real_situation_1(self):
-        tree = parser.parse("spam:eggs")
+        tree = _parse("spam:eggs")
         result = self.transformer(tree)
         expected = {'match': {'spam': {
             'query': 'eggs', 'zero_terms_query': 'none'}}}
         self.assertDictEqual(result, expected)
 
     def test_real_situation_2(self):
-        tree = parser.parse("pays:FR AND monty:python")
+        tree = _parse("pays:FR AND monty:python")
         result = self.transformer(tree)
         expected = {'bool': {'must': [
             {'term': {'pays': {'value': 'FR'}}},
@@ -763,7 +741,7 @@ class ElasticsearchTreeTransformerRealQueriesTestCase(TestCase):
         self.assertDictEqual(result, expected)
 
     def test_real_situation_2_not_filter(self):
-        tree = parser.parse("spam:de AND -monty:le AND title:alone")
+        tree = _parse("spam:de AND -monty:le AND title:alone")
         result = self.transformer(tree)
         expected = {'bool': {'must': [
             {'match': {'spam': {'query': 'de', 'zero_terms_query': 'all'}}},
@@ -779,7 +757,7 @@ class ElasticsearchTreeTransformerRealQueriesTestCase(TestCase):
         self.assertDictEqual(result, expected)
 
     def test_real_situation_3(self):
-        tree = parser.parse("spam:eggs AND (monty:python OR life:bryan)")
+        tree = _parse("spam:eggs AND (monty:python OR life:bryan)")
         result = self.transformer(tree)
         expected = {'bool': {'must': [
             {'match': {'spam': {'query': 'eggs', 'zero_terms_query': 'all'}}},
@@ -805,7 +783,7 @@ class ElasticsearchTreeTransformerRealQueriesTestCase(TestCase):
         self.assertDictEqual(result, expected)
 
     def test_real_situation_4(self):
-        tree = parser.parse("spam:eggs OR monty:{2 TO 4]")
+        tree = _parse("spam:eggs OR monty:{2 TO 4]")
         result = self.transformer(tree)
         expected = {'bool': {'should': [
             {'match': {'spam': {'query': 'eggs', 'zero_terms_query': 'none'}}},
@@ -814,7 +792,7 @@ class ElasticsearchTreeTransformerRealQueriesTestCase(TestCase):
         self.assertDictEqual(result, expected)
 
     def test_real_situation_5(self):
-        tree = parser.parse("pays:FR OR objet:{2 TO 4]")
+        tree = _parse("pays:FR OR objet:{2 TO 4]")
         result = self.transformer(tree)
         expected = {'bool': {'should': [
             {'term': {'pays': {'value': 'FR'}}},
@@ -823,7 +801,7 @@ class ElasticsearchTreeTransformerRealQueriesTestCase(TestCase):
         self.assertDictEqual(result, expected)
 
     def test_real_situation_6(self):
-        tree = parser.parse("pays:FR OR monty:{2 TO 4] OR python")
+        tree = _parse("pays:FR OR monty:{2 TO 4] OR python")
         result = self.transformer(tree)
         expected = {'bool': {'should': [
             {'term': {'pays': {'value': 'FR'}}},
@@ -832,45 +810,67 @@ class ElasticsearchTreeTransformerRealQueriesTestCase(TestCase):
         ]}}
         self.assertDictEqual(result, expected)
 
-    def test_real_situation_7(self):
-        tree = parser.parse(
-            "pays:FR AND "
-            "type:AO AND "
-            "thes:(("
-            "SI_FM_GC_RC_Relation_client_commerciale_courrier OR "
-            "SI_FM_GC_Gestion_Projet_Documents OR "
-            "SI_FM_GC_RC_Mailing_prospection_Enquete_Taxe_apprentissage OR "
-            "SI_FM_GC_RC_Site_web OR "
-            "SI_FM_GC_RH OR SI_FM_GC_RH_Paye OR "
-            "SI_FM_GC_RH_Temps) OR NOT C91_Etranger)"
-        )
-        result = self.transformer(tree)
-        expected = {'bool': {'must': [
-            {'term': {'pays': {'value': 'FR'}}},
-            {'term': {'type': {'value': 'AO'}}},
+    # expected query, built once as it is big
+    EXPECTED_7 = {'bool': {'must': [
+        {'term': {'pays': {'value': 'FR'}}},
+        {'term': {'type': {'value': 'AO'}}},
+        {'bool': {'should': [
             {'bool': {'should': [
-                {'bool': {'should': [
-                    {'term': {'thes': {
-                        'value': 'SI_FM_GC_RC_Relation_client_commerciale_courrier'}}},
-                    {'term': {'thes': {
-                        'value': 'SI_FM_GC_Gestion_Projet_Documents'}}},
-                    {'term': {'thes': {
-                        'value': 'SI_FM_GC_RC_Mailing_prospection_Enquete_Taxe_apprentissage'}}},
-                    {'term': {'thes': {'value': 'SI_FM_GC_RC_Site_web'}}},
-                    {'term': {'thes': {'value': 'SI_FM_GC_RH'}}},
-                    {'term': {'thes': {'value': 'SI_FM_GC_RH_Paye'}}},
-                    {'term': {'thes': {'value': 'SI_FM_GC_RH_Temps'}}}
-                ]}},
-                {'bool': {'must_not': [
-                    {'term': {'thes': {'value': 'C91_Etranger'}}}
-                ]}}
+                {'term': {'thes': {
+                    'value': 'SI_FM_GC_RC_Relation_client_commerciale_courrier'}}},
+                {'term': {'thes': {
+                    'value': 'SI_FM_GC_Gestion_Projet_Documents'}}},
+                {'term': {'thes': {
+                    'value': 'SI_FM_GC_RC_Mailing_prospection_Enquete_Taxe_apprentissage'}}},
+                {'term': {'thes': {'value': 'SI_FM_GC_RC_Site_web'}}},
+                {'term': {'thes': {'value': 'SI_FM_GC_RH'}}},
+                {'term': {'thes': {'value': 'SI_FM_GC_RH_Paye'}}},
+                {'term': {'thes': {'value': 'SI_FM_GC_RH_Temps'}}}
+            ]}},
+            {'bool': {'must_not': [
+                {'term': {'thes': {'value': 'C91_Etranger'}}}
             ]}}
         ]}}
+    ]}}
+
+    QUERY_7 = (
+        "pays:FR AND "
+        "type:AO AND "
+        "thes:(("
+        "SI_FM_GC_RC_Relation_client_commerciale_courrier OR "
+        "SI_FM_GC_Gestion_Projet_Documents OR "
+        "SI_FM_GC_RC_Mailing_prospection_Enquete_Taxe_apprentissage OR "
+        "SI_FM_GC_RC_Site_web OR "
+        "SI_FM_GC_RH OR SI_FM_GC_RH_Paye OR "
+        "SI_FM_GC_RH_Temps) OR NOT C91_Etranger)"
+    )
+    # the tree of QUERY_7, built directly, as we test the query builder, not the parser
+    TREE_7 = AndOperation(
+        SearchField('pays', Word('FR')),
+        SearchField('type', Word('AO')),
+        SearchField('thes', FieldGroup(OrOperation(
+            Group(OrOperation(
+                Word('SI_FM_GC_RC_Relation_client_commerciale_courrier'),
+                Word('SI_FM_GC_Gestion_Projet_Documents'),
+                Word('SI_FM_GC_RC_Mailing_prospection_Enquete_Taxe_apprentissage'),
+                Word('SI_FM_GC_RC_Site_web'),
+                Word('SI_FM_GC_RH'),
+                Word('SI_FM_GC_RH_Paye'),
+                Word('SI_FM_GC_RH_Temps'),
+            )),
+            Not(Word('C91_Etranger')),
+        ))),
+    )
 
-        self.assertDictEqual(result, expected)
+    def test_real_situation_7(self):
+        result = self.transformer(self.TREE_7)
+        self.assertDictEqual(result, self.EXPECTED_7)
+
+    def test_real_situation_7_parse(self):
+        self.assertEqual(_parse(self.QUERY_7), self.TREE_7)
 
     def test_real_situation_8(self):
-        tree = parser.parse(
+        tree = _parse(
             '''objet:(accessibilite OR diagnosti* OR adap OR
                       "ad ap" -(travaux OR amiante OR "hors voirie"))'''
         )
@@ -882,7 +882,7 @@ class ElasticsearchTreeTransformerRealQueriesTestCase(TestCase):
         new line and carrier field should be replace by a normal space
         """
 
-        tree = parser.parse('spam:"monthy\r\n python"')
+        tree = _parse('spam:"monthy\r\n python"')
         result = self.transformer(tree)
         expected = {
             'match_phrase': {'spam': {'query': 'monthy python'}}}
@@ -951,7 +951,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a sub field using column
         """
 
-        tree = parser.parse('text:(english:"Spanish Cow")')
+        tree = _parse('text:(english:"Spanish Cow")')
         result = self.transformer(tree)
         expected = {
             "match_phrase": {
@@ -965,7 +965,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a sub field using dot
         """
 
-        tree = parser.parse('text.english:"Spanish Cow"')
+        tree = _parse('text.english:"Spanish Cow"')
         result = self.transformer(tree)
         expected = {
             "match_phrase": {
@@ -979,7 +979,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a sub field using dot
         """
 
-        tree = parser.parse('author.book.isbn.ref.lower:thebiglebowski')
+        tree = _parse('author.book.isbn.ref.lower:thebiglebowski')
         result = self.transformer(tree)
         expected = {'nested': {
             'path': 'author.book',
@@ -992,7 +992,23 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a nested field using column
         """
 
-        tree = parser.parse('author:(firstname:"François")')
+        tree = _parse('author:(firstname:"François")')
+        result = self.transformer(tree)
+        expected = {
+            "nested": {
+                "path": "author",
+                "query": {
+                    "match_phrase": {
+                        "author.firstname": {"query": "François"}
+                    }
+                }
+            }
+        }
+        self.assertDictEqual(result, expected)
+
+    def test_boost_on_nested_field(self):
+        # boost is not rendered on nested queries, but must not fail
+        tree = _parse('(author.firstname:"François")^2')
         result = self.transformer(tree)
         expected = {
             "nested": {
@@ -1011,7 +1027,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a nested field using dotted notation
         """
 
-        tree = parser.parse('author.firstname:"François"')
+        tree = _parse('author.firstname:"François"')
         result = self.transformer(tree)
         expected = {
             "nested": {
@@ -1029,7 +1045,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         """
         Can query a nested field
         """
-        tree = parser.parse('manager.firstname:"François" OR manager.address.zipcode:44000')
+        tree = _parse('manager.firstname:"François" OR manager.address.zipcode:44000')
         result = self.transformer(tree)
         expected = {
             "bool": {
@@ -1053,7 +1069,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         """
         Can query a nested field that should not be analyzed means a term query
         """
-        tree = parser.parse('publish.site:"http://example.com/foo#bar"')
+        tree = _parse('publish.site:"http://example.com/foo#bar"')
         result = self.transformer(tree)
         expected = {
             "nested": {
@@ -1072,7 +1088,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a nested field
         """
 
-        tree = parser.parse(
+        tree = _parse(
             'author.firstname:"François" AND author.lastname:"Dupont"')
         result = self.transformer(tree)
         expected = {
@@ -1112,7 +1128,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a nested field
         """
 
-        tree = parser.parse(
+        tree = _parse(
             'author.book.format.type:"pdf"')
         result = self.transformer(tree)
         expected = {
@@ -1134,7 +1150,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a nested field
         """
 
-        tree = parser.parse(
+        tree = _parse(
             'author:(firstname:"François" AND lastname:"Dupont")')
         result = self.transformer(tree)
         expected = {
@@ -1168,7 +1184,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a nested field
         """
 
-        tree = parser.parse(
+        tree = _parse(
             'author:(book:(title:"printemps"))')
         result = self.transformer(tree)
         expected = {
@@ -1190,7 +1206,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a nested field using colons
         """
 
-        tree = parser.parse(
+        tree = _parse(
             'author:(book:(format:(type:"pdf")))')
         result = self.transformer(tree)
         expected = {
@@ -1212,7 +1228,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query nested fields in nested field using column
         """
 
-        tree = parser.parse(
+        tree = _parse(
             'author:(book:(format:(type:"pdf" OR type:"epub")))')
         result = self.transformer(tree)
         expected = {
@@ -1247,7 +1263,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a deep nested field using dots
         """
 
-        tree = parser.parse(
+        tree = _parse(
             'author.book.format.type:"pdf" OR author.book.format.type:"epub"')
         result = self.transformer(tree)
         expected = {
@@ -1287,7 +1303,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         Can query a nested field
         """
 
-        tree = parser.parse(
+        tree = _parse(
             'author:book:(title:"Hugo" isbn.ref:"2222" format:type:("pdf" OR "epub"))'
         )
         result = self.transformer(tree)
@@ -1344,7 +1360,7 @@ class NestedAndObjectFieldsTestCase(TestCase):
         self.assertDictEqual(result, expected)
 
     def test_nested_and_object_queries_together(self):
-        tree = parser.parse(
+        tree = _parse(
             '''
             author:(book:(isbn.ref:"foo" AND title:"bar") OR lastname:"baz") AND
             manager:(subteams.supervisor.name:("John" OR "Paul") AND NOT address.zipcode:44)